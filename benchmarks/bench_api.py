@@ -0,0 +1,229 @@
+"""Offline benchmark of the Greenchoice API clients against the local stand-in server.
+
+Times the login, a complete update with a new client (cold), with a logged in client (warm) and right behind another
+update (coalesced), the async and the sync client, the chunked decoding of the meter readings and its peak memory
+use, the parse functions and rendering the sensor states, for meter histories of growing size. Results can be saved
+and compared with a saved baseline to catch regressions.
+
+Usage: python benchmarks/bench_api.py [--months 1,12,60,120,180] [--latency-ms 0] [--iterations 10]
+                                       [--save results.json] [--compare baseline.json --tolerance 0.25]
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import sys
+import threading
+import time
+import tracemalloc
+from pathlib import Path
+from types import SimpleNamespace
+
+import aiohttp
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from custom_components.greenchoice.const import REQUEST_CHUNK_SIZE  # noqa: E402
+from custom_components.greenchoice.greenchoice_api import (  # noqa: E402
+    GreenchoiceApi, GreenchoiceApiData, GreenchoiceAsyncApi, GreenchoiceOpnamesParser, GreenchoiceProducts, GreenchoiceResponseChunks
+)
+from stub_server import OVEREENKOMST_ID, PASSWORD, USERNAME, StubServer, opnames_payload, start, tarieven_payload  # noqa: E402
+
+# the parse functions are private to the client, the benchmark calls them directly to time them in isolation
+parse_opnames = GreenchoiceAsyncApi._GreenchoiceAsyncApi__parse_opnames
+parse_tarieven = GreenchoiceAsyncApi._GreenchoiceAsyncApi__parse_tarieven
+
+
+def decode_opnames(body: bytes):
+    """Decode and parse an OpnamesOphalen response the way the client receives it, in chunks."""
+    chunks = GreenchoiceResponseChunks()
+    for offset in range(0, len(body), REQUEST_CHUNK_SIZE):
+        chunks.feed(body[offset:offset + REQUEST_CHUNK_SIZE])
+    return parse_opnames(chunks.decode(GreenchoiceOpnamesParser()))
+
+
+def peak_memory(func) -> int:
+    """Peak of the memory allocated while running func, in bytes."""
+    tracemalloc.start()
+    try:
+        func()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+class BackgroundServer:
+    """Runs the stub server on its own event loop, so the blocking client can be benchmarked too."""
+
+    def __init__(self, server: StubServer) -> None:
+        self.server = server
+        self.loop = asyncio.new_event_loop()
+        self.base_url = None
+        self._runner = None
+        self._thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        self._runner, self.base_url = asyncio.run_coroutine_threadsafe(start(self.server), self.loop).result()
+        return self
+
+    def __exit__(self, *exc_info):
+        asyncio.run_coroutine_threadsafe(self._runner.cleanup(), self.loop).result()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join()
+
+
+def summarize(durations: list[float]) -> dict:
+    durations = sorted(durations)
+    return {
+        "median_ms": statistics.median(durations) * 1000,
+        "p90_ms": durations[min(len(durations) - 1, int(len(durations) * 0.9))] * 1000,
+    }
+
+
+def time_sync(func, iterations: int) -> dict:
+    durations = []
+    for _ in range(iterations):
+        start_time = time.perf_counter()
+        func()
+        durations.append(time.perf_counter() - start_time)
+    return summarize(durations)
+
+
+async def time_async(func, iterations: int) -> dict:
+    durations = []
+    for _ in range(iterations):
+        start_time = time.perf_counter()
+        await func()
+        durations.append(time.perf_counter() - start_time)
+    return summarize(durations)
+
+
+async def bench_async_client(base_url: str, iterations: int) -> dict:
+    results = {}
+    async with aiohttp.ClientSession() as session:
+        async def login():
+            session.cookie_jar.clear()
+            await GreenchoiceAsyncApi(session, USERNAME, PASSWORD, base_url).async_login()
+
+        async def update_cold():
+            session.cookie_jar.clear()
+            await GreenchoiceAsyncApi(session, USERNAME, PASSWORD, base_url).async_get_update(OVEREENKOMST_ID)
+
+        results["login_async"] = await time_async(login, iterations)
+        results["update_cold_async"] = await time_async(update_cold, iterations)
+
+        session.cookie_jar.clear()
+        api = GreenchoiceAsyncApi(session, USERNAME, PASSWORD, base_url)
+        await api.async_get_update(OVEREENKOMST_ID)
+        # updates right behind each other are answered from the coalesced responses
+        results["update_coalesced_async"] = await time_async(lambda: api.async_get_update(OVEREENKOMST_ID), iterations)
+        api.coalesce_seconds = 0
+        results["update_warm_async"] = await time_async(lambda: api.async_get_update(OVEREENKOMST_ID), iterations)
+    return results
+
+
+def bench_sync_client(base_url: str, iterations: int) -> dict:
+    def update_cold():
+        with GreenchoiceApi(USERNAME, PASSWORD, base_url) as api:
+            api.get_update(OVEREENKOMST_ID)
+
+    return {"update_cold_sync": time_sync(update_cold, iterations)}
+
+
+def bench_parsing(months: int, iterations: int) -> dict:
+    opnames = json.dumps(opnames_payload(months)).encode()
+    tarieven = tarieven_payload()
+    products = GreenchoiceProducts({"heeftStroomLevering": True, "heeftGasLevering": True})
+    # for comparison, decoding the whole document at once holds it in memory as nested dicts
+    print(f"  peak memory decoding OpnamesOphalen: chunked {peak_memory(lambda: decode_opnames(opnames)) / 1024:.0f} KiB, "
+          f"as a whole {peak_memory(lambda: json.loads(opnames)) / 1024:.0f} KiB")
+    return {
+        "decode_opnames": time_sync(lambda: decode_opnames(opnames), iterations),
+        "parse_tarieven": time_sync(lambda: parse_tarieven(tarieven, products), iterations),
+    }
+
+
+def bench_entities(months: int, iterations: int) -> dict:
+    try:
+        from custom_components.greenchoice import sensor
+    except ImportError as e:
+        print(f"  skipping entity rendering, Home Assistant is not available: {e}")
+        return {}
+
+    meterstanden = decode_opnames(json.dumps(opnames_payload(months)).encode())
+    products = GreenchoiceProducts({"heeftStroomLevering": True, "heeftGasLevering": True})
+    coordinator = SimpleNamespace(
+        data=GreenchoiceApiData(meterstanden.meterstand_stroom, meterstanden.meterstand_gas, parse_tarieven(tarieven_payload(), products),
+                                verbruik_stroom=meterstanden.verbruik_stroom, verbruik_gas=meterstanden.verbruik_gas),
+        config_entry=SimpleNamespace(entry_id="benchmark", data={"overeenkomst_id": OVEREENKOMST_ID}),
+    )
+    entities = [
+        sensor.GreenchoiceSensorEntity(coordinator=coordinator, description=description, name="greenchoice_benchmark", service_key=service_key)
+        for descriptions, service_key in ((sensor.SENSORS_POWER, "meterstand_stroom"), (sensor.SENSORS_GAS, "meterstand_gas"),
+                                          (sensor.SENSORS_TARIFFS_POWER, "tarieven"), (sensor.SENSORS_TARIFFS_GAS, "tarieven"),
+                                          (sensor.SENSORS_CONSUMPTION_POWER, "verbruik_stroom"), (sensor.SENSORS_CONSUMPTION_GAS, "verbruik_gas"))
+        for description in descriptions
+    ]
+
+    def render():
+        for entity in entities:
+            entity.native_value
+            entity.last_reset
+
+    return {"entity_render": time_sync(lambda: [render() for _ in range(100)], iterations)}
+
+
+def run(months_list: list[int], latency_ms: float, iterations: int) -> dict:
+    results = {}
+    server = StubServer(months_list[0], latency_ms)
+    with BackgroundServer(server) as background:
+        for months in months_list:
+            server.set_months(months)
+            print(f"{months} months of readings, OpnamesOphalen {server.opnames_size / 1024:.0f} KiB")
+            size_results = asyncio.run(bench_async_client(background.base_url, iterations))
+            size_results.update(bench_sync_client(background.base_url, iterations))
+            size_results.update(bench_parsing(months, iterations))
+            size_results.update(bench_entities(months, iterations))
+            for name, result in size_results.items():
+                print(f"  {name:<22} median {result['median_ms']:9.2f} ms   p90 {result['p90_ms']:9.2f} ms")
+            results[str(months)] = size_results
+    return results
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list[str]:
+    regressions = []
+    for months, size_results in results.items():
+        for name, result in size_results.items():
+            previous = baseline.get(months, {}).get(name)
+            if previous and result["median_ms"] > previous["median_ms"] * (1 + tolerance):
+                regressions.append(f"{name} ({months} months): {previous['median_ms']:.2f} ms -> {result['median_ms']:.2f} ms")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--months", default="1,12,60,120,180", help="comma separated sizes of the meter history")
+    parser.add_argument("--latency-ms", type=float, default=0, help="delay of the stand-in server for every response")
+    parser.add_argument("--iterations", type=int, default=10)
+    parser.add_argument("--save", type=Path, help="write the results as JSON")
+    parser.add_argument("--compare", type=Path, help="baseline results to compare with")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown compared to the baseline")
+    args = parser.parse_args()
+
+    results = run([int(months) for months in args.months.split(",")], args.latency_ms, args.iterations)
+    if args.save:
+        args.save.write_text(json.dumps(results, indent=2))
+
+    if args.compare:
+        regressions = compare(results, json.loads(args.compare.read_text()), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""Import time benchmark of the integration, measured with python -X importtime.
+
+Imports the parts of the integration Home Assistant loads separately (the package when the integration is set up,
+the config flow, the sensor platform and diagnostics) each in a fresh interpreter, after the modules Home Assistant
+has loaded itself by then. Only what is imported on top of those counts, the modules that took longest are listed.
+
+Usage: python benchmarks/bench_import.py [--repeat 5] [--top 10] [--baseline module,module]
+"""
+import argparse
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+PACKAGE = "custom_components.greenchoice"
+TARGETS = (PACKAGE, f"{PACKAGE}.config_flow", f"{PACKAGE}.sensor", f"{PACKAGE}.diagnostics")
+# loaded by Home Assistant before it loads the integration, recorder is a dependency of the integration
+BASELINE = (
+    "homeassistant.core",
+    "homeassistant.config_entries",
+    "homeassistant.helpers.aiohttp_client",
+    "homeassistant.helpers.config_validation",
+    "homeassistant.helpers.entity_platform",
+    "homeassistant.helpers.storage",
+    "homeassistant.components.sensor",
+    "homeassistant.components.recorder",
+)
+MARKER = "greenchoice-import-benchmark"
+
+
+def import_times(target: str, baseline: list[str]) -> dict[str, int]:
+    """Self import time per module of importing target on top of the baseline in a fresh interpreter, in microseconds."""
+    # the objects of the baseline are frozen, a full garbage collection over all of them would otherwise land on
+    # whichever module of the target happens to be importing and take longer than the module itself
+    code = "; ".join([*(f"import {module}" for module in baseline),
+                      f"import gc, sys; gc.freeze(); print({MARKER!r}, file=sys.stderr, flush=True)", f"import {target}"])
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", code], cwd=ROOT, capture_output=True, text=True)
+    if result.returncode:
+        raise RuntimeError(f"importing {target} failed:\n{result.stderr.splitlines()[-1]}")
+    times = {}
+    lines = result.stderr.splitlines()
+    for line in lines[lines.index(MARKER) + 1:]:
+        parts = [part.strip() for part in line.removeprefix("import time:").split("|")]
+        if len(parts) == 3 and parts[0].isdigit():
+            times[parts[2].strip()] = int(parts[0])
+    return times
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5, help="fresh interpreters per target")
+    parser.add_argument("--top", type=int, default=10, help="number of slowest modules to list")
+    parser.add_argument("--baseline", default=",".join(BASELINE), help="comma separated modules imported before the target")
+    args = parser.parse_args()
+    baseline = [module for module in args.baseline.split(",") if module]
+
+    for target in TARGETS:
+        runs = [import_times(target, baseline) for _ in range(args.repeat)]
+        totals = [sum(times.values()) for times in runs]
+        # the run with the median total, so the listed modules add up to the reported time
+        times = runs[totals.index(sorted(totals)[len(totals) // 2])]
+        print(f"{target:<42} median {statistics.median(totals) / 1000:8.1f} ms   {len(times)} modules")
+        for module, us in sorted(times.items(), key=lambda item: item[1], reverse=True)[:args.top]:
+            print(f"    {module:<60} {us / 1000:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""Benchmark of the login form token extraction against saved login page fixtures.
+
+Compares GreenchoiceFormInputParser with the BeautifulSoup based extraction it replaced, checks that both return
+the same values and measures the import time of both parsers.
+
+Usage: python benchmarks/bench_login_form.py [--number N]
+"""
+import argparse
+import subprocess
+import sys
+import timeit
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+FIXTURES = Path(__file__).resolve().parent / "fixtures"
+sys.path.insert(0, str(ROOT))
+
+from custom_components.greenchoice.greenchoice_api import GreenchoiceFormInputParser, OIDC_PARAMS  # noqa: E402
+
+try:
+    import bs4
+except ImportError:
+    bs4 = None
+
+
+def extract_token(html_txt: str):
+    return GreenchoiceFormInputParser.parse(html_txt, ("__RequestVerificationToken",))["__RequestVerificationToken"]
+
+
+def extract_oidc_params(html_txt: str):
+    values = GreenchoiceFormInputParser.parse(html_txt, OIDC_PARAMS)
+    return {**values, "scope": values["scope"].replace(" ", "+")}
+
+
+def extract_token_bs4(html_txt: str):
+    soup = bs4.BeautifulSoup(html_txt, "html.parser")
+    return soup.find("input", {"name": "__RequestVerificationToken"}).attrs.get("value")
+
+
+def extract_oidc_params_bs4(html_txt: str):
+    soup = bs4.BeautifulSoup(html_txt, "html.parser")
+    values = {name: soup.find("input", {"name": name}).attrs.get("value") for name in OIDC_PARAMS}
+    return {**values, "scope": values["scope"].replace(" ", "+")}
+
+
+def import_time_us(module: str) -> int:
+    """Cumulative import time of a module in a fresh interpreter, in microseconds."""
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                            capture_output=True, text=True, check=True)
+    for line in result.stderr.splitlines():
+        parts = [part.strip() for part in line.split("|")]
+        if len(parts) == 3 and parts[2] == module:
+            return int(parts[1])
+    return -1
+
+
+def bench(name: str, func, html_txt: str, number: int) -> float:
+    seconds = min(timeit.repeat(lambda: func(html_txt), number=number, repeat=5))
+    per_call = seconds / number * 1e6
+    print(f"{name:<32} {per_call:10.1f} us/call")
+    return per_call
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--number", type=int, default=200, help="calls per timing run")
+    args = parser.parse_args()
+
+    login_page = (FIXTURES / "login_page.html").read_text()
+    oidc_page = (FIXTURES / "signin_oidc_page.html").read_text()
+
+    print(f"login page {len(login_page)} bytes, signin-oidc page {len(oidc_page)} bytes\n")
+    token = bench("token (HTMLParser)", extract_token, login_page, args.number)
+    oidc = bench("oidc params (HTMLParser)", extract_oidc_params, oidc_page, args.number)
+
+    if bs4 is None:
+        print("\nbeautifulsoup4 not installed, skipping the comparison")
+        return
+
+    assert extract_token(login_page) == extract_token_bs4(login_page), "token differs from BeautifulSoup"
+    assert extract_oidc_params(oidc_page) == extract_oidc_params_bs4(oidc_page), "oidc params differ from BeautifulSoup"
+
+    token_bs4 = bench("token (BeautifulSoup)", extract_token_bs4, login_page, args.number)
+    oidc_bs4 = bench("oidc params (BeautifulSoup)", extract_oidc_params_bs4, oidc_page, args.number)
+    print(f"\nspeedup: token {token_bs4 / token:.1f}x, oidc params {oidc_bs4 / oidc:.1f}x")
+    print(f"import time: html.parser {import_time_us('html.parser')} us, bs4 {import_time_us('bs4')} us")
+
+
+if __name__ == "__main__":
+    main()
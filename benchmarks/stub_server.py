@@ -0,0 +1,214 @@
+"""Local stand-in for mijn.greenchoice.nl, serving synthetic data for benchmarks.
+
+Mimics the login page, the login form post, /signin-oidc, /microbus/init and the OpnamesOphalen and
+GetTariefOvereenkomst microbus requests. The meter history covers a configurable number of months with a daily
+reading each day, and every response can be delayed to simulate network latency.
+
+Usage: python benchmarks/stub_server.py [--port 8080] [--months 120] [--latency-ms 50]
+"""
+import argparse
+import asyncio
+import json
+from datetime import date, timedelta
+from pathlib import Path
+
+from aiohttp import web
+
+FIXTURES = Path(__file__).resolve().parent / "fixtures"
+
+USERNAME = "benchmark@example.com"
+PASSWORD = "benchmark"
+OVEREENKOMST_ID = 1234567
+AUTH_COOKIE = "GreenchoiceAuth"
+
+
+def opnames_payload(months: int, end: date = date(2024, 6, 30)) -> dict:
+    """OpnamesOphalen response with a daily reading for each of the last months."""
+    first = date(end.year, end.month, 1)
+    for _ in range(months - 1):
+        first = (first - timedelta(days=1)).replace(day=1)
+
+    stroom_months = []
+    gas_months = []
+    day = first
+    index = 0
+    while day <= end:
+        month_start = day
+        stroom_opnames = []
+        gas_opnames = []
+        while day <= end and day.month == month_start.month:
+            opname_datum = f"{day.isoformat()}T00:00:00"
+            stroom_opnames.append({
+                "opnameDatum": opname_datum,
+                "opnameType": "Dagstand",
+                "standen": [
+                    {"telwerk": 1, "waarde": round(10000 + index * 4.2, 3), "eenheid": "kWh"},
+                    {"telwerk": 2, "waarde": round(8000 + index * 3.1, 3), "eenheid": "kWh"},
+                    {"telwerk": 3, "waarde": round(2000 + index * 1.7, 3), "eenheid": "kWh"},
+                    {"telwerk": 4, "waarde": round(1500 + index * 1.1, 3), "eenheid": "kWh"},
+                ],
+            })
+            gas_opnames.append({
+                "opnameDatum": opname_datum,
+                "opnameType": "Dagstand",
+                "standen": [{"telwerk": 5, "waarde": round(5000 + index * 2.3, 3), "eenheid": "m3"}],
+            })
+            day += timedelta(days=1)
+            index += 1
+        stroom_months.append({"jaar": month_start.year, "maand": month_start.month, "opnames": stroom_opnames})
+        gas_months.append({"jaar": month_start.year, "maand": month_start.month, "opnames": gas_opnames})
+
+    return {
+        "model": {
+            "heeftStroom": True,
+            "heeftGas": True,
+            "productenOpnamesModel": [
+                {"productType": "Stroom", "opnamesJaarMaandModel": stroom_months},
+                {"productType": "Gas", "opnamesJaarMaandModel": gas_months},
+            ],
+        }
+    }
+
+
+def init_payload() -> dict:
+    """/microbus/init response with a single customer and address."""
+    return {
+        "profile": {"voorkeursOvereenkomst": {"klantnummer": 7654321, "overeenkomstId": OVEREENKOMST_ID}},
+        "klantgegevens": [{
+            "klantnummer": 7654321,
+            "adressen": [{
+                "overeenkomstId": OVEREENKOMST_ID,
+                "postcode": "1234AB",
+                "huisnummer": 1,
+                "plaats": "ZWOLLE",
+                "heeftLevering": True,
+                "heeftStroomLevering": True,
+                "heeftGasLevering": True,
+            }],
+        }],
+    }
+
+
+def tarieven_payload() -> dict:
+    """GetTariefOvereenkomst response."""
+    return {
+        "stroom": {
+            "leveringLaagAllin": 0.38,
+            "terugleveringLaagAllin": 0.38,
+            "leveringHoogAllin": 0.41,
+            "terugleveringHoogAllin": 0.41,
+            "terugleverVergoeding": 0.09,
+            "totaleJaarlijkseKostenIncBtw": 1450.12,
+        },
+        "gas": {
+            "leveringAllin": 1.42,
+            "totaleJaarlijkseKostenIncBtw": 1820.55,
+        },
+    }
+
+
+class StubServer:
+    """The stand-in application, with request counters for the benchmark harness."""
+
+    def __init__(self, months: int = 12, latency_ms: float = 0) -> None:
+        self.latency = latency_ms / 1000
+        self.requests: dict[str, int] = {}
+        self._login_page = (FIXTURES / "login_page.html").read_text()
+        self._oidc_page = (FIXTURES / "signin_oidc_page.html").read_text()
+        self._init = json.dumps(init_payload()).encode()
+        self._tarieven = json.dumps(tarieven_payload()).encode()
+        self.set_months(months)
+
+    def set_months(self, months: int) -> None:
+        """Change the size of the served meter history."""
+        self.months = months
+        self._opnames = json.dumps(opnames_payload(months)).encode()
+
+    @property
+    def opnames_size(self) -> int:
+        return len(self._opnames)
+
+    def app(self) -> web.Application:
+        app = web.Application(middlewares=[self._middleware])
+        app.router.add_get("/", self._root)
+        app.router.add_get("/Account/Login", self._login_page_handler)
+        app.router.add_post("/Account/Login", self._login_post)
+        app.router.add_post("/signin-oidc", self._signin_oidc)
+        app.router.add_get("/microbus/init", self._microbus_init)
+        app.router.add_post("/microbus/request", self._microbus_request)
+        return app
+
+    @web.middleware
+    async def _middleware(self, request: web.Request, handler):
+        key = request.path
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        response = await handler(request)
+        self.requests[key] = self.requests.get(key, 0) + 1
+        return response
+
+    @staticmethod
+    def _authenticated(request: web.Request) -> bool:
+        return request.cookies.get(AUTH_COOKIE) == "1"
+
+    async def _root(self, request: web.Request):
+        raise web.HTTPFound("/Account/Login?ReturnUrl=%2Fconnect%2Fauthorize%2Fcallback")
+
+    async def _login_page_handler(self, request: web.Request):
+        return web.Response(text=self._login_page, content_type="text/html")
+
+    async def _login_post(self, request: web.Request):
+        form = await request.post()
+        if form.get("Username") != USERNAME or form.get("Password") != PASSWORD:
+            return web.Response(text=self._login_page, content_type="text/html")
+        return web.Response(text=self._oidc_page, content_type="text/html")
+
+    async def _signin_oidc(self, request: web.Request):
+        response = web.Response(text="")
+        response.set_cookie(AUTH_COOKIE, "1")
+        return response
+
+    async def _microbus_init(self, request: web.Request):
+        if not self._authenticated(request):
+            return web.Response(status=403)
+        return web.Response(body=self._init, content_type="application/json")
+
+    async def _microbus_request(self, request: web.Request):
+        if not self._authenticated(request):
+            return web.Response(status=403)
+        payload = await request.json()
+        name = payload.get("name")
+        self.requests[name] = self.requests.get(name, 0) + 1
+        if name == "OpnamesOphalen":
+            return web.Response(body=self._opnames, content_type="application/json")
+        if name == "GetTariefOvereenkomst":
+            return web.Response(body=self._tarieven, content_type="application/json")
+        return web.Response(status=404)
+
+
+async def start(server: StubServer, host: str = "127.0.0.1", port: int = 0) -> tuple[web.AppRunner, str]:
+    """Start the stub server, returns the runner and the base url to pass to the API client."""
+    runner = web.AppRunner(server.app())
+    await runner.setup()
+    site = web.TCPSite(runner, host, port)
+    await site.start()
+    port = runner.addresses[0][1]
+    # use a host name, aiohttp doesn't store cookies for bare IP addresses by default
+    return runner, f"http://localhost:{port}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--months", type=int, default=120, help="months of meter history")
+    parser.add_argument("--latency-ms", type=float, default=0, help="delay for every response")
+    args = parser.parse_args()
+
+    server = StubServer(args.months, args.latency_ms)
+    print(f"Serving {args.months} months of readings ({server.opnames_size} bytes) on http://localhost:{args.port}")
+    print(f"Log in with {USERNAME} / {PASSWORD}, overeenkomst {OVEREENKOMST_ID}")
+    web.run_app(server.app(), host="localhost", port=args.port, print=None)
+
+
+if __name__ == "__main__":
+    main()
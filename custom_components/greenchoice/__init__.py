@@ -1,5 +1,3 @@
-from datetime import timedelta
-
 import homeassistant.helpers.config_validation as cv
 import voluptuous as vol
 from homeassistant.components.sensor import (
@@ -10,20 +8,17 @@ from homeassistant.config_entries import ConfigEntry
 from homeassistant.const import CONF_USERNAME, CONF_PASSWORD, CONF_NAME, CONF_SCAN_INTERVAL
 from homeassistant.core import HomeAssistant
 from homeassistant.exceptions import ConfigEntryNotReady
-from homeassistant.helpers.update_coordinator import DataUpdateCoordinator, UpdateFailed
 
 from .const import (
     DOMAIN,
     CONF_OVEREENKOMST_ID,
-    CONF_METERSTAND_STROOM_ENABLED,
-    CONF_METERSTAND_GAS_ENABLED,
-    CONF_TARIEVEN_ENABLED,
     CONFIGFLOW_VERSION,
     LOGGER,
     DEFAULT_SCAN_INTERVAL_MINUTES,
     DEFAULT_NAME,
 )
-from .greenchoice_api import GreenchoiceApi, GreenchoiceOvereenkomst, GreenchoiceError, GreenchoiceApiData
+from .hub import account_key, async_release_hub, session_store
+from .scheduler import schedule_store
 
 PLATFORMS = (SENSOR_DOMAIN,)
 
@@ -38,12 +33,23 @@ PLATFORM_SCHEMA = PLATFORM_SCHEMA.extend({
 async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     """Set up Greenchoice Sensor from a config entry."""
 
-    scan_interval = timedelta(minutes=entry.options.get(CONF_SCAN_INTERVAL, DEFAULT_SCAN_INTERVAL_MINUTES))
-    coordinator = GreenchoiceDataUpdateCoordinator(hass, scan_interval)
-    try:
-        await coordinator.async_config_entry_first_refresh()
-    except ConfigEntryNotReady:
-        raise
+    # the coordinator brings in the update coordinator of Home Assistant and the recorder statistics, loading the
+    # integration for the config flow doesn't need those
+    from .coordinator import GreenchoiceDataUpdateCoordinator
+
+    scan_interval_minutes = int(entry.options.get(CONF_SCAN_INTERVAL, DEFAULT_SCAN_INTERVAL_MINUTES))
+    coordinator = GreenchoiceDataUpdateCoordinator(hass, entry, scan_interval_minutes)
+    await coordinator.hub.async_restore_session()
+    await coordinator.async_restore_schedule()
+    if await coordinator.async_restore_data():
+        # the entities start with the saved data, fresh data follows without holding up the setup
+        hass.async_create_task(coordinator.async_refresh())
+    else:
+        try:
+            await coordinator.async_config_entry_first_refresh()
+        except ConfigEntryNotReady:
+            await async_release_hub(hass, entry.data[CONF_USERNAME], entry.entry_id)
+            raise
 
     hass.data.setdefault(DOMAIN, {})
     hass.data[DOMAIN][entry.entry_id] = coordinator
@@ -59,10 +65,30 @@ async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     unload_ok = await hass.config_entries.async_unload_platforms(entry, PLATFORMS)
     if unload_ok:
         hass.data[DOMAIN].pop(entry.entry_id)
+        await async_release_hub(hass, entry.data[CONF_USERNAME], entry.entry_id)
 
     return unload_ok
 
 
+async def async_remove_entry(hass: HomeAssistant, entry: ConfigEntry) -> None:
+    """Remove the persisted data of a config entry."""
+    from .coordinator import data_store
+    from .costs import costs_store
+    from .statistics import statistics_store
+    from .tariffs import tariffs_store
+
+    await statistics_store(hass, entry.entry_id).async_remove()
+    await data_store(hass, entry.entry_id).async_remove()
+    await costs_store(hass, entry.entry_id).async_remove()
+    await schedule_store(hass, entry.entry_id).async_remove()
+    await tariffs_store(hass, entry.data[CONF_OVEREENKOMST_ID]).async_remove()
+    username = entry.data[CONF_USERNAME]
+    if not any(account_key(other.data.get(CONF_USERNAME) or "") == account_key(username)
+               for other in hass.config_entries.async_entries(DOMAIN) if other.entry_id != entry.entry_id):
+        # the session cookies are shared by the entries of the account
+        await session_store(hass, username).async_remove()
+
+
 async def async_migrate_entry(hass: HomeAssistant, config_entry: ConfigEntry):
     """Migrate old entry."""
     if config_entry.version <= 1:
@@ -77,40 +103,3 @@ async def async_migrate_entry(hass: HomeAssistant, config_entry: ConfigEntry):
 async def async_update_options(hass: HomeAssistant, entry: ConfigEntry) -> None:
     """Update options."""
     await hass.config_entries.async_reload(entry.entry_id)
-
-
-class GreenchoiceDataUpdateCoordinator(DataUpdateCoordinator[GreenchoiceApiData]):
-    """Class to manage fetching Greenchoice API data from single endpoint."""
-
-    config_entry: ConfigEntry
-
-    def __init__(
-            self,
-            hass: HomeAssistant,
-            scan_interval: timedelta,
-    ) -> None:
-        """Initialize global Greenchoice data updater."""
-        super().__init__(
-            hass,
-            LOGGER,
-            name=DOMAIN,
-            update_interval=scan_interval,
-        )
-
-    async def _async_update_data(self) -> GreenchoiceApiData:
-        """Fetch data from Greenchoice API."""
-        try:
-            api = GreenchoiceApi(self.config_entry.data[CONF_USERNAME], self.config_entry.data[CONF_PASSWORD])
-            await self.hass.async_add_executor_job(api.login)
-            data = await self.hass.async_add_executor_job(
-                api.get_update,
-                int(self.config_entry.data[CONF_OVEREENKOMST_ID]),
-                self.config_entry.options.get(CONF_METERSTAND_STROOM_ENABLED, True),
-                self.config_entry.options.get(CONF_METERSTAND_GAS_ENABLED, True),
-                self.config_entry.options.get(CONF_TARIEVEN_ENABLED, True),
-            )
-            if data is None:
-                raise GreenchoiceError("Unable to retrieve data")
-            return data
-        except GreenchoiceError as err:
-            raise UpdateFailed(err) from err
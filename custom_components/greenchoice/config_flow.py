@@ -4,7 +4,8 @@ from __future__ import annotations
 from typing import Any
 
 import voluptuous as vol
-from homeassistant.config_entries import ConfigFlow, ConfigEntry, OptionsFlow
+from aiohttp import ClientSession
+from homeassistant.config_entries import SOURCE_IMPORT, ConfigFlow, ConfigEntry, OptionsFlow
 from homeassistant.const import (
     CONF_PASSWORD,
     CONF_USERNAME,
@@ -14,18 +15,24 @@ from homeassistant.core import callback
 from homeassistant.data_entry_flow import FlowResult
 from homeassistant.helpers.selector import SelectSelector, SelectSelectorConfig, SelectSelectorMode, SelectOptionDict
 
-from . import GreenchoiceApi, GreenchoiceError, DEFAULT_SCAN_INTERVAL_MINUTES
 from .const import (
+    DEFAULT_SCAN_INTERVAL_MINUTES,
     CONF_OVEREENKOMST_ID,
     CONFIGFLOW_VERSION,
     DOMAIN,
+    LOGGER,
+    OVEREENKOMST_ALL,
     CONF_METERSTAND_STROOM_ENABLED,
     CONF_METERSTAND_GAS_ENABLED,
     CONF_TARIEVEN_ENABLED,
     DEFAULT_METERSTAND_STROOM_ENABLED,
     DEFAULT_METERSTAND_GAS_ENABLED,
     DEFAULT_TARIEVEN_ENABLED,
+    SCAN_INTERVAL_ADAPTIVE,
 )
+from .greenchoice_api import GreenchoiceAsyncApi, GreenchoiceError
+from .hub import async_create_session, async_find_hub, async_release_session, session_store
+from .scheduler import async_get_scheduler
 
 
 class GreenchoiceFlowHandler(ConfigFlow, domain=DOMAIN):
@@ -35,6 +42,10 @@ class GreenchoiceFlowHandler(ConfigFlow, domain=DOMAIN):
 
     data = None
     api = None
+    # whether the api is the one of the hub of an account that is in use already
+    shared_api = False
+    # client session of the logins of the flow, released when the flow ends
+    session: ClientSession | None = None
 
     @staticmethod
     @callback
@@ -51,9 +62,24 @@ class GreenchoiceFlowHandler(ConfigFlow, domain=DOMAIN):
 
         errors = {}
         if user_input is not None:
+            hub = async_find_hub(self.hass, user_input[CONF_USERNAME])
+            if hub is not None and hub.api.password == user_input[CONF_PASSWORD]:
+                # the account is in use already, its session saves a login
+                api = hub.api
+                self.shared_api = True
+                # the customer details the hub cached may predate a contract the user came to add, the flow fetches them once
+                api.invalidate_cache()
+            else:
+                if self.session is None:
+                    self.session = async_create_session(self.hass)
+                else:
+                    # a new attempt, possibly for another account, starts without the cookies of the attempt before
+                    self.session.cookie_jar.clear()
+                api = GreenchoiceAsyncApi(self.session, user_input[CONF_USERNAME], user_input[CONF_PASSWORD])
+                api.limiter = async_get_scheduler(self.hass).limiter
             try:
-                api = GreenchoiceApi(user_input[CONF_USERNAME], user_input[CONF_PASSWORD])
-                await self.hass.async_add_executor_job(api.login)
+                if not api.logged_in:
+                    await api.async_login()
             except GreenchoiceError:
                 errors["base"] = "login_failure"
             else:
@@ -75,39 +101,73 @@ class GreenchoiceFlowHandler(ConfigFlow, domain=DOMAIN):
         """Handle setup flow Greenchoice sensor."""
         errors = {}
 
-        if user_input is not None:
-            self.data[CONF_OVEREENKOMST_ID] = user_input[CONF_OVEREENKOMST_ID]
-            await self.async_set_unique_id(user_input[CONF_OVEREENKOMST_ID])
-            self._abort_if_unique_id_configured()
-            products = await self.hass.async_add_executor_job(self.api.get_products, int(user_input[CONF_OVEREENKOMST_ID]))
-            self.data["has_power"] = products.has_power
-            self.data["has_gas"] = products.has_gas
-            default_options = {
-                CONF_SCAN_INTERVAL: DEFAULT_SCAN_INTERVAL_MINUTES,
-                CONF_METERSTAND_STROOM_ENABLED: self.data["has_power"],
-                CONF_METERSTAND_GAS_ENABLED: self.data["has_gas"],
-                CONF_TARIEVEN_ENABLED: True,
-            }
-            return self.async_create_entry(title=f"Greenchoice ({user_input[CONF_OVEREENKOMST_ID]})", data=self.data, options=default_options)
-
-        overeenkomsten = await self.hass.async_add_executor_job(self.api.get_overeenkomsten)
-        options = list[SelectOptionDict]()
-
+        # the contracts and their products come from the customer details, which the client fetches once per flow and caches
+        overeenkomsten = await self.api.async_get_overeenkomsten()
         existing_configurations = [int(config_entry.data[CONF_OVEREENKOMST_ID]) for config_entry in self.hass.config_entries.async_entries(self.handler)]
+        available = [overeenkomst for overeenkomst in overeenkomsten if overeenkomst.overeenkomst_id not in existing_configurations]
 
-        for overeenkomst in overeenkomsten:
-            if overeenkomst.overeenkomst_id in existing_configurations:
-                continue
-            options.append(SelectOptionDict(value=str(overeenkomst.overeenkomst_id), label=str(overeenkomst)))
+        if user_input is not None:
+            if user_input[CONF_OVEREENKOMST_ID] == OVEREENKOMST_ALL:
+                overeenkomst_ids = [str(overeenkomst.overeenkomst_id) for overeenkomst in available]
+            else:
+                overeenkomst_ids = [user_input[CONF_OVEREENKOMST_ID]]
+            if not overeenkomst_ids:
+                return self.async_abort(reason="no_available_contracts")
+            await self.async_set_unique_id(overeenkomst_ids[0])
+            self._abort_if_unique_id_configured()
 
+            entries = [await self.__async_entry(overeenkomst_id) for overeenkomst_id in overeenkomst_ids]
+            if not self.shared_api and self.api.logged_in:
+                # the entries share a new hub for the account, which continues with this session instead of logging in again
+                await session_store(self.hass, self.data[CONF_USERNAME]).async_save({"cookies": self.api.export_cookies()})
+            for data, options in entries[1:]:
+                # a flow creates a single entry, the other contracts are added through an import flow each
+                await self.hass.config_entries.flow.async_init(DOMAIN, context={"source": SOURCE_IMPORT}, data={"data": data, "options": options})
+            data, options = entries[0]
+            return self.async_create_entry(title=f"Greenchoice ({data[CONF_OVEREENKOMST_ID]})", data=data, options=options)
+
+        options = [SelectOptionDict(value=str(overeenkomst.overeenkomst_id), label=str(overeenkomst)) for overeenkomst in available]
         if not len(options):
             return self.async_abort(reason="no_available_contracts")
+        if len(options) > 1:
+            options.append(SelectOptionDict(value=OVEREENKOMST_ALL, label=f"Alle {len(options)} beschikbare overeenkomsten"))
 
         schema = vol.Schema({
             vol.Required(CONF_OVEREENKOMST_ID): SelectSelector(SelectSelectorConfig(options=options, mode=SelectSelectorMode.DROPDOWN))
         })
         return self.async_show_form(step_id="setup_overeenkomst", data_schema=schema, errors=errors)
 
+    @callback
+    def async_remove(self) -> None:
+        """Release the client session when the flow ends, the entries continue with the session cookies it saved."""
+        if self.session is not None:
+            async_release_session(self.session)
+
+    async def async_step_import(self, import_data: dict[str, Any]) -> FlowResult:
+        """Add a contract selected in a user flow that added all contracts of the account."""
+        data = import_data["data"]
+        await self.async_set_unique_id(data[CONF_OVEREENKOMST_ID])
+        self._abort_if_unique_id_configured()
+        LOGGER.debug(f"Adding overeenkomst {data[CONF_OVEREENKOMST_ID]}")
+        return self.async_create_entry(title=f"Greenchoice ({data[CONF_OVEREENKOMST_ID]})", data=data, options=import_data["options"])
+
+    async def __async_entry(self, overeenkomst_id: str) -> tuple[dict[str, Any], dict[str, Any]]:
+        """Return the data and default options of the entry for a contract."""
+        products = await self.api.async_get_products(int(overeenkomst_id))
+        data = {
+            **self.data,
+            CONF_OVEREENKOMST_ID: overeenkomst_id,
+            "has_power": products.has_power,
+            "has_gas": products.has_gas,
+        }
+        default_options = {
+            CONF_SCAN_INTERVAL: DEFAULT_SCAN_INTERVAL_MINUTES,
+            CONF_METERSTAND_STROOM_ENABLED: products.has_power,
+            CONF_METERSTAND_GAS_ENABLED: products.has_gas,
+            CONF_TARIEVEN_ENABLED: True,
+        }
+        return data, default_options
+
 
 class GreenchoiceSensorOptionsFlowHandler(OptionsFlow):
     """Handle options."""
@@ -131,6 +191,7 @@ class GreenchoiceSensorOptionsFlowHandler(OptionsFlow):
             return self.async_create_entry(title="", data=options_data)
 
         options = list[SelectOptionDict]()
+        options.append(SelectOptionDict(value=str(SCAN_INTERVAL_ADAPTIVE), label="automatisch, rond de publicatie van nieuwe meterstanden"))
         options.append(SelectOptionDict(value="60", label="elk uur"))
         options.append(SelectOptionDict(value="1440", label="elke dag"))
         options.append(SelectOptionDict(value="10080", label="elke week"))
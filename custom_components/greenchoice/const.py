@@ -4,8 +4,11 @@ import logging
 from typing import Final, Dict
 
 from homeassistant.backports.enum import StrEnum
+from homeassistant.const import ENERGY_KILO_WATT_HOUR, VOLUME_CUBIC_METERS
 
 DOMAIN: Final = "greenchoice"
+DATA_HUBS: Final = "hubs"
+DATA_SCHEDULER: Final = "scheduler"
 
 MANUFACTURER: Final = "Greenchoice"
 CONFIGFLOW_VERSION = 1
@@ -13,14 +16,26 @@ LOGGER = logging.getLogger(__package__)
 
 DEFAULT_NAME = 'Energieverbruik'
 
+# the units of the tariff sensors, written as before when they were taken from the dsmr_reader component
+PRICE_EUR_KWH: Final = f"EUR/{ENERGY_KILO_WATT_HOUR}"
+PRICE_EUR_M3: Final = f"EUR/{VOLUME_CUBIC_METERS}"
+
 SERVICE_METERSTAND_STROOM = "meterstand_stroom"
 SERVICE_METERSTAND_GAS = "meterstand_gas"
 SERVICE_TARIEVEN = "tarieven"
+SERVICE_VERBRUIK_STROOM = "verbruik_stroom"
+SERVICE_VERBRUIK_GAS = "verbruik_gas"
+SERVICE_KOSTEN = "kosten"
+SERVICE_DIAGNOSTIEK = "diagnostiek"
 
 SERVICES: Dict[str, str] = {
     SERVICE_METERSTAND_STROOM: "Greenchoice meterstanden stroom",
     SERVICE_METERSTAND_GAS: "Greenchoice meterstanden gas",
-    SERVICE_TARIEVEN: "Greenchoice tarieven"
+    SERVICE_TARIEVEN: "Greenchoice tarieven",
+    SERVICE_VERBRUIK_STROOM: "Greenchoice verbruik stroom",
+    SERVICE_VERBRUIK_GAS: "Greenchoice verbruik gas",
+    SERVICE_KOSTEN: "Greenchoice kosten",
+    SERVICE_DIAGNOSTIEK: "Greenchoice diagnostiek"
 }
 
 
@@ -49,22 +64,123 @@ class MeasurementNames(StrEnum):
     COST_GAS_YEARLY = 'kosten_gas_jaar'
     COST_TOTAL_YEARLY = 'kosten_totaal_jaar'
 
-
-MEASUREMENT_TYPES = {
-    1: 'consumption_high',
-    2: 'consumption_low',
-    3: 'return_high',
-    4: 'return_low'
+    # Consumption per day, week and month
+    ENERGY_HIGH_IN_DAY = 'stroom_hoog_in_dag'
+    ENERGY_HIGH_IN_WEEK = 'stroom_hoog_in_week'
+    ENERGY_HIGH_IN_MONTH = 'stroom_hoog_in_maand'
+    ENERGY_LOW_IN_DAY = 'stroom_laag_in_dag'
+    ENERGY_LOW_IN_WEEK = 'stroom_laag_in_week'
+    ENERGY_LOW_IN_MONTH = 'stroom_laag_in_maand'
+    ENERGY_HIGH_OUT_DAY = 'stroom_hoog_uit_dag'
+    ENERGY_HIGH_OUT_WEEK = 'stroom_hoog_uit_week'
+    ENERGY_HIGH_OUT_MONTH = 'stroom_hoog_uit_maand'
+    ENERGY_LOW_OUT_DAY = 'stroom_laag_uit_dag'
+    ENERGY_LOW_OUT_WEEK = 'stroom_laag_uit_week'
+    ENERGY_LOW_OUT_MONTH = 'stroom_laag_uit_maand'
+    GAS_IN_DAY = 'gas_in_dag'
+    GAS_IN_WEEK = 'gas_in_week'
+    GAS_IN_MONTH = 'gas_in_maand'
+
+    # Costs of the consumption per day and month, and since the costs are tracked
+    COST_ENERGY_DAY = 'kosten_stroom_dag'
+    COST_ENERGY_MONTH = 'kosten_stroom_maand'
+    COST_ENERGY_TOTAL = 'kosten_stroom_totaal'
+    COST_GAS_DAY = 'kosten_gas_dag'
+    COST_GAS_MONTH = 'kosten_gas_maand'
+    COST_GAS_TOTAL = 'kosten_gas_totaal'
+
+    # Diagnostics
+    UPDATE_DURATION = 'update_duur'
+    UPDATE_DURATION_P90 = 'update_duur_p90'
+    PARSE_DURATION = 'verwerking_duur'
+    LOGIN_COUNT = 'aantal_logins'
+
+
+# Periods of the consumption sensors
+PERIOD_DAY = 'dag'
+PERIOD_WEEK = 'week'
+PERIOD_MONTH = 'maand'
+PERIODS = (PERIOD_DAY, PERIOD_WEEK, PERIOD_MONTH)
+
+# Meter register (telwerk) of each reading in the meter history
+TELWERK_MEASUREMENTS = {
+    1: MeasurementNames.ENERGY_HIGH_IN,
+    2: MeasurementNames.ENERGY_LOW_IN,
+    3: MeasurementNames.ENERGY_HIGH_OUT,
+    4: MeasurementNames.ENERGY_LOW_OUT,
+    5: MeasurementNames.GAS_IN,
 }
+# A reading more than this fraction lower than the one before means the meter was replaced and restarted counting
+# from zero (the same threshold as the sensor statistics of Home Assistant), a smaller drop is a correction
+METER_RESET_RATIO = 0.1
+
+
+def meter_increment(previous: float, value: float) -> float:
+    """Return the consumption on a meter register between two consecutive readings."""
+    if value >= previous:
+        return value - previous
+    if value < previous * (1 - METER_RESET_RATIO):
+        # the meter was replaced, all of the new reading was consumed after the replacement
+        return value
+    # a correction of an estimated reading, the consumption was counted before already
+    return 0.0
+
 
 DEFAULT_SCAN_INTERVAL_MINUTES = 60
+# Scan interval option value for polling around the time Greenchoice usually publishes new readings
+SCAN_INTERVAL_ADAPTIVE = 0
+ADAPTIVE_MIN_INTERVAL_MINUTES = 15
+ADAPTIVE_MAX_INTERVAL_MINUTES = 24 * 60
+ADAPTIVE_LATE_INTERVAL_MINUTES = 2 * 60
+ADAPTIVE_WINDOW_BEFORE_MINUTES = 60
+ADAPTIVE_WINDOW_AFTER_MINUTES = 2 * 60
+CUSTOMER_CACHE_TTL_MINUTES = 24 * 60
+SHARED_METERSTANDEN_MAX_AGE_SECONDS = 5 * 60
+TARIEVEN_MAX_AGE_SECONDS = 24 * 60 * 60
+# seconds an update waits for the tariffs once it has the meter readings, after that it uses the previous tariffs
+TARIEVEN_WAIT_SECONDS = 5
+METRICS_WINDOW_SIZE = 100
+
+# Requests: timeouts per attempt, retries of transient failures and the circuit breaker for outages
+REQUEST_CONNECT_TIMEOUT_SECONDS = 10
+REQUEST_READ_TIMEOUT_SECONDS = 30
+REQUEST_TOTAL_TIMEOUT_SECONDS = 45
+# seconds during which the response of a request answers identical requests that follow it
+REQUEST_COALESCE_SECONDS = 5
+# bytes per chunk of a response that is received in chunks
+REQUEST_CHUNK_SIZE = 64 * 1024
+RETRY_ATTEMPTS = 3
+RETRY_BACKOFF_BASE_SECONDS = 2
+RETRY_BACKOFF_MAX_SECONDS = 30
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+CIRCUIT_BREAKER_FAILURE_THRESHOLD = 3
+CIRCUIT_BREAKER_RESET_SECONDS = 10 * 60
+# limits of the requests of all accounts together: requests at a time and a token bucket of requests per second
+REQUEST_MAX_CONCURRENT = 4
+REQUEST_RATE_PER_SECOND = 1
+REQUEST_BURST = 5
 DEFAULT_METERSTAND_STROOM_ENABLED = True
 DEFAULT_METERSTAND_GAS_ENABLED = True
 DEFAULT_TARIEVEN_ENABLED = True
 
 CONF_OVEREENKOMST_ID = 'overeenkomst_id'
+# overeenkomst option of the config flow that adds all contracts of the account at once
+OVEREENKOMST_ALL = 'all'
 CONF_METERSTAND_STROOM_ENABLED = 'meterstand_stroom_enabled'
 CONF_METERSTAND_GAS_ENABLED = 'meterstand_gas_enabled'
 CONF_TARIEVEN_ENABLED = 'tarieven_enabled'
 
 API_URL = "https://mijn.greenchoice.nl"
+
+SIGNAL_METRICS_UPDATED = f"{DOMAIN}_metrics_updated_{{}}"
+
+STORAGE_VERSION = 1
+STORAGE_KEY_STATISTICS = f"{DOMAIN}.statistics"
+STORAGE_KEY_SESSION = f"{DOMAIN}.session"
+STORAGE_KEY_DATA = f"{DOMAIN}.data"
+STORAGE_KEY_COSTS = f"{DOMAIN}.costs"
+STORAGE_KEY_TARIFFS = f"{DOMAIN}.tariffs"
+STORAGE_KEY_SCHEDULE = f"{DOMAIN}.schedule"
+
+EVENT_TARIFF_CHANGED = f"{DOMAIN}_tariff_changed"
+SESSION_SAVE_DELAY_SECONDS = 60
@@ -0,0 +1,169 @@
+"""Coordinator of the updates of a Greenchoice config entry."""
+from dataclasses import replace
+from datetime import timedelta
+
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.const import CONF_USERNAME, CONF_PASSWORD
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.dispatcher import async_dispatcher_send
+from homeassistant.helpers.storage import Store
+from homeassistant.helpers.update_coordinator import DataUpdateCoordinator, UpdateFailed
+from homeassistant.util import dt as dt_util
+
+from .const import (
+    ADAPTIVE_MIN_INTERVAL_MINUTES,
+    DOMAIN,
+    CONF_OVEREENKOMST_ID,
+    CONF_METERSTAND_STROOM_ENABLED,
+    CONF_METERSTAND_GAS_ENABLED,
+    CONF_TARIEVEN_ENABLED,
+    LOGGER,
+    DEFAULT_SCAN_INTERVAL_MINUTES,
+    SCAN_INTERVAL_ADAPTIVE,
+    SIGNAL_METRICS_UPDATED,
+    STORAGE_KEY_DATA,
+    STORAGE_VERSION,
+)
+from .greenchoice_api import GreenchoiceAsyncApi, GreenchoiceError, GreenchoiceApiData
+from .costs import GreenchoiceCostCalculator
+from .hub import GreenchoiceHub, async_get_hub
+from .metrics import GreenchoiceMetrics
+from .scheduler import GreenchoiceAdaptiveSchedule, GreenchoicePollScheduler, async_get_scheduler, schedule_store
+from .statistics import GreenchoiceStatisticsImporter
+from .tariffs import GreenchoiceTariffHistory
+
+
+def data_store(hass: HomeAssistant, entry_id: str) -> Store:
+    """Return the store with the last retrieved data of a config entry."""
+    return Store(hass, STORAGE_VERSION, f"{STORAGE_KEY_DATA}.{entry_id}")
+
+
+class GreenchoiceDataUpdateCoordinator(DataUpdateCoordinator[GreenchoiceApiData]):
+    """Class to manage fetching Greenchoice API data from single endpoint."""
+
+    config_entry: ConfigEntry
+
+    def __init__(
+            self,
+            hass: HomeAssistant,
+            entry: ConfigEntry,
+            scan_interval_minutes: int,
+    ) -> None:
+        """Initialize global Greenchoice data updater."""
+        self._adaptive_schedule = GreenchoiceAdaptiveSchedule() if scan_interval_minutes == SCAN_INTERVAL_ADAPTIVE else None
+        if self._adaptive_schedule is not None:
+            scan_interval_minutes = DEFAULT_SCAN_INTERVAL_MINUTES
+        # the interval to wait at least, the polls themselves are placed in the slots of the account
+        self._interval = timedelta(minutes=scan_interval_minutes)
+        super().__init__(
+            hass,
+            LOGGER,
+            name=DOMAIN,
+            update_interval=self._interval,
+        )
+        self._scheduler: GreenchoicePollScheduler = async_get_scheduler(hass)
+        self._notified_data: GreenchoiceApiData | None = None
+        self._notified_success: bool = False
+        # measurements changed by the last update as (service, measurement) pairs, None when all entities should
+        # write their state
+        self.changed_measurements: set[tuple[str, str]] | None = None
+        self.metrics = GreenchoiceMetrics()
+        # Long-lived client shared by all entries of the account, its session cookies are reused across polls and
+        # it only logs in again on expiry.
+        self.hub: GreenchoiceHub = async_get_hub(hass, entry.data[CONF_USERNAME], entry.data[CONF_PASSWORD])
+        self.hub.entry_ids.add(entry.entry_id)
+        self.api: GreenchoiceAsyncApi = self.hub.api
+        self._statistics = GreenchoiceStatisticsImporter(hass, entry)
+        self._tariffs = GreenchoiceTariffHistory(hass, entry.data[CONF_OVEREENKOMST_ID])
+        self._costs = GreenchoiceCostCalculator(hass, entry, self._tariffs)
+        self._store = data_store(hass, entry.entry_id)
+        self._schedule_store = schedule_store(hass, entry.entry_id)
+
+    async def async_restore_data(self) -> bool:
+        """Serve the data saved by a previous run until the first update, returns whether there was any."""
+        stored = await self._store.async_load()
+        if not stored:
+            return False
+        LOGGER.debug(f"Restoring Greenchoice data retrieved at {stored['saved_at']}")
+        self.async_set_updated_data(GreenchoiceApiData.from_dict(stored["data"]))
+        return True
+
+    async def async_restore_schedule(self) -> None:
+        """Continue the adaptive schedule with the publish times it learned before."""
+        if self._adaptive_schedule is None:
+            return
+        stored = await self._schedule_store.async_load()
+        if stored:
+            self._adaptive_schedule.restore(stored)
+
+    async def _async_update_data(self) -> GreenchoiceApiData:
+        """Fetch data from Greenchoice API."""
+        try:
+            with self.metrics.time("update"):
+                return await self.__async_fetch_data()
+        except Exception:
+            if self._adaptive_schedule is not None:
+                # the interval of the last successful update could skip the whole publish window
+                self._interval = self._adaptive_schedule.retry_interval(dt_util.now())
+            raise
+        finally:
+            self.update_interval = self.__next_interval()
+
+    def __next_interval(self) -> timedelta:
+        if self._adaptive_schedule is not None:
+            # the adaptive interval is kept, only rounded up to the next slot of a fine grid
+            earliest, period = self._interval, timedelta(minutes=ADAPTIVE_MIN_INTERVAL_MINUTES)
+        else:
+            # at least half an interval later, so a refresh shortly before a slot doesn't poll twice in a row
+            earliest, period = self._interval / 2, self._interval
+        return self._scheduler.next_interval(self.config_entry.data[CONF_USERNAME], dt_util.utcnow(), earliest, period)
+
+    async def __async_fetch_data(self) -> GreenchoiceApiData:
+        try:
+            data = await self.api.async_get_update(
+                int(self.config_entry.data[CONF_OVEREENKOMST_ID]),
+                self.config_entry.options.get(CONF_METERSTAND_STROOM_ENABLED, True),
+                self.config_entry.options.get(CONF_METERSTAND_GAS_ENABLED, True),
+                self.config_entry.options.get(CONF_TARIEVEN_ENABLED, True),
+            )
+            if data is None:
+                raise GreenchoiceError("Unable to retrieve data")
+            if self.data is not None and data.fingerprint == self.data.fingerprint:
+                # nothing changed upstream, keep the current data so the entities aren't written again
+                LOGGER.debug("Greenchoice data unchanged")
+                self.metrics.increment("updates_unchanged")
+                data = self.data
+            else:
+                with self.metrics.time("statistics_import"):
+                    await self._statistics.async_import(data)
+                if data.tarieven is not None:
+                    await self._tariffs.async_record(data.tarieven)
+                with self.metrics.time("costs"):
+                    data = replace(data, kosten=await self._costs.async_update(data))
+                await self._store.async_save({"saved_at": dt_util.utcnow().isoformat(), "data": data.as_dict()})
+            if self._adaptive_schedule is not None:
+                learned = self._adaptive_schedule.as_dict()
+                self._interval = self._adaptive_schedule.next_interval(data, dt_util.now())
+                if self._adaptive_schedule.as_dict() != learned:
+                    await self._schedule_store.async_save(self._adaptive_schedule.as_dict())
+            self.hub.async_schedule_save_session()
+            return data
+        except GreenchoiceError as err:
+            self.metrics.increment("updates_failed")
+            raise UpdateFailed(err) from err
+
+    @callback
+    def async_update_listeners(self) -> None:
+        """Update all registered listeners, unless they already have the current data."""
+        # the diagnostic sensors follow every refresh, also when the data itself is unchanged
+        async_dispatcher_send(self.hass, SIGNAL_METRICS_UPDATED.format(self.config_entry.entry_id))
+        if self.data is self._notified_data and self.last_update_success == self._notified_success:
+            return
+        if self.last_update_success != self._notified_success or self.data is None or self._notified_data is None:
+            # availability changed or there is nothing to compare with
+            self.changed_measurements = None
+        else:
+            self.changed_measurements = self.data.changed_measurements(self._notified_data)
+        self._notified_data = self.data
+        self._notified_success = self.last_update_success
+        super().async_update_listeners()
@@ -0,0 +1,172 @@
+"""Costs of the consumption of a Greenchoice contract, computed from the meter history and the tariffs."""
+from __future__ import annotations
+
+from bisect import bisect_right
+from datetime import date, datetime, timedelta
+from operator import attrgetter
+from typing import Any, Callable, Dict, List, Optional
+
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers.storage import Store
+
+from .const import (
+    CONF_OVEREENKOMST_ID,
+    STORAGE_KEY_COSTS,
+    STORAGE_VERSION,
+    MeasurementNames,
+    meter_increment,
+)
+from .greenchoice_api import GreenchoiceApiData, GreenchoiceKosten, GreenchoiceMeterReading, GreenchoiceTarieven
+from .statistics import async_add_cost_statistics
+from .tariffs import GreenchoiceTariffHistory
+
+PRODUCT_STROOM = "stroom"
+PRODUCT_GAS = "gas"
+
+
+def costs_store(hass: HomeAssistant, entry_id: str) -> Store:
+    """Return the store with the cost totals of a config entry."""
+    return Store(hass, STORAGE_VERSION, f"{STORAGE_KEY_COSTS}.{entry_id}")
+
+
+def stroom_prices(tarieven: GreenchoiceTarieven) -> Optional[Dict[MeasurementNames, float]]:
+    """Price per kWh of each electricity register, the return is compensated with the terugleververgoeding.
+
+    Contracts without a terugleververgoeding don't compensate the return, its registers are left out.
+    """
+    if tarieven.tarief_stroom_hoog_in is None or tarieven.tarief_stroom_laag_in is None:
+        return None
+    prices = {
+        MeasurementNames.ENERGY_HIGH_IN: tarieven.tarief_stroom_hoog_in,
+        MeasurementNames.ENERGY_LOW_IN: tarieven.tarief_stroom_laag_in,
+    }
+    if tarieven.tarief_stroom_terugleververgoeding is not None:
+        prices[MeasurementNames.ENERGY_HIGH_OUT] = -tarieven.tarief_stroom_terugleververgoeding
+        prices[MeasurementNames.ENERGY_LOW_OUT] = -tarieven.tarief_stroom_terugleververgoeding
+    return prices
+
+
+def gas_prices(tarieven: GreenchoiceTarieven) -> Optional[Dict[MeasurementNames, float]]:
+    """Price per m³ of gas."""
+    if tarieven.tarief_gas_in is None:
+        return None
+    return {MeasurementNames.GAS_IN: tarieven.tarief_gas_in}
+
+
+def reading_day(datum: datetime) -> date:
+    """Return the day whose consumption the reading of datum completes, a reading is the meter state at the start of its day."""
+    return (datum - timedelta(days=1)).date()
+
+
+class GreenchoiceCostCalculator:
+    """Incrementally prices the consumption of a contract.
+
+    Every new reading adds the cost of its increment over the previous reading to the day, month and running totals,
+    priced with the tariffs from the tariff history that were in force on its day. Readings are priced once, the
+    state is persisted and only the daily costs of the current month are kept. The first run starts at the beginning
+    of the month of the latest reading, the tariff history doesn't go back further than the integration does.
+    """
+
+    def __init__(self, hass: HomeAssistant, entry: ConfigEntry, tariffs: GreenchoiceTariffHistory) -> None:
+        """Initialize the cost calculator."""
+        self.hass = hass
+        self._overeenkomst_id = entry.data[CONF_OVEREENKOMST_ID]
+        self._store = costs_store(hass, entry.entry_id)
+        self._tariffs = tariffs
+        self._state: Dict[str, Dict[str, Any]] | None = None
+
+    async def async_update(self, data: GreenchoiceApiData) -> Optional[GreenchoiceKosten]:
+        """Price the readings that weren't priced yet and return the cost totals."""
+        if self._state is None:
+            self._state = await self._store.async_load() or {}
+
+        changed = False
+        products = []
+        for product, historie, get_prices in ((PRODUCT_STROOM, data.historie_stroom, stroom_prices),
+                                              (PRODUCT_GAS, data.historie_gas, gas_prices)):
+            if not historie:
+                continue
+            products.append(product)
+            changed |= self.__add_readings(product, historie, get_prices)
+
+        if changed:
+            await self._store.async_save(self._state)
+
+        return self.__kosten(products)
+
+    def __add_readings(self, product: str, historie: List[GreenchoiceMeterReading],
+                       get_prices: Callable[[GreenchoiceTarieven], Optional[Dict[MeasurementNames, float]]]) -> bool:
+        state = self._state.get(product)
+        if state is None:
+            month_start = datetime.combine(reading_day(historie[-1].datum).replace(day=1), datetime.min.time())
+            baseline = historie[max(0, bisect_right(historie, month_start, key=attrgetter("datum")) - 1)]
+            state = self._state[product] = {"last_datum": baseline.datum.isoformat(), "last_values": dict(baseline.waarden), "totaal": 0.0, "dagen": {}}
+
+        new_readings = historie[bisect_right(historie, datetime.fromisoformat(state["last_datum"]), key=attrgetter("datum")):]
+        if not new_readings:
+            return False
+
+        last_values: Dict[str, float] = state["last_values"]
+        total: float = state["totaal"]
+        days: Dict[str, float] = state["dagen"]
+        totals: List[tuple[datetime, float]] = []
+        tarieven: GreenchoiceTarieven | None = None
+        prices: Dict[MeasurementNames, float] | None = None
+        priced: List[GreenchoiceMeterReading] = []
+        for reading in new_readings:
+            day = reading_day(reading.datum)
+            reading_tarieven = self._tariffs.at(datetime.combine(day, datetime.min.time()))
+            if reading_tarieven is not tarieven:
+                # the tariffs hardly ever change, most readings reuse the prices of the reading before
+                tarieven = reading_tarieven
+                prices = get_prices(tarieven) if tarieven is not None else None
+            if prices is None:
+                # without tariffs the readings are priced by a later update
+                break
+
+            cost = 0.0
+            for measurement, price in prices.items():
+                value = reading.waarden.get(measurement)
+                previous = last_values.get(measurement)
+                if value is not None and previous is not None:
+                    cost += price * meter_increment(previous, value)
+            days[day.isoformat()] = days.get(day.isoformat(), 0.0) + cost
+            total += cost
+            totals.append((reading.datum, round(total, 2)))
+            last_values = {**last_values, **reading.waarden}
+            priced.append(reading)
+
+        if not priced:
+            return False
+        month_start = reading_day(priced[-1].datum).replace(day=1).isoformat()
+        state.update({
+            "last_datum": priced[-1].datum.isoformat(),
+            "last_values": last_values,
+            "totaal": total,
+            "dagen": {day: cost for day, cost in days.items() if day >= month_start},
+        })
+        async_add_cost_statistics(self.hass, self._overeenkomst_id, f"kosten_{product}", f"kosten {product}", totals)
+        return True
+
+    def __kosten(self, products: List[str]) -> Optional[GreenchoiceKosten]:
+        kosten: Dict[str, float | datetime] = {}
+        last_day: date | None = None
+        for product in products:
+            state = self._state.get(product)
+            if state is None:
+                continue
+            day = reading_day(datetime.fromisoformat(state["last_datum"]))
+            month_start = day.replace(day=1).isoformat()
+            kosten[f"kosten_{product}_dag"] = round(state["dagen"].get(day.isoformat(), 0.0), 2)
+            kosten[f"kosten_{product}_maand"] = round(sum(cost for cost_day, cost in state["dagen"].items() if cost_day >= month_start), 2)
+            kosten[f"kosten_{product}_totaal"] = round(state["totaal"], 2)
+            last_day = day if last_day is None else max(last_day, day)
+
+        if last_day is None:
+            return None
+        return GreenchoiceKosten(
+            **kosten,
+            start_dag=datetime.combine(last_day, datetime.min.time()),
+            start_maand=datetime.combine(last_day.replace(day=1), datetime.min.time()),
+        )
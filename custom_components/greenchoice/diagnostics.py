@@ -0,0 +1,40 @@
+"""Diagnostics support for Greenchoice."""
+from __future__ import annotations
+
+from typing import Any
+
+from homeassistant.components.diagnostics import async_redact_data
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.const import CONF_PASSWORD, CONF_USERNAME
+from homeassistant.core import HomeAssistant
+
+from .const import DOMAIN
+from .coordinator import GreenchoiceDataUpdateCoordinator
+from .scheduler import async_get_scheduler
+
+TO_REDACT = {CONF_USERNAME, CONF_PASSWORD}
+
+
+async def async_get_config_entry_diagnostics(hass: HomeAssistant, entry: ConfigEntry) -> dict[str, Any]:
+    """Return diagnostics for a config entry."""
+    coordinator: GreenchoiceDataUpdateCoordinator = hass.data[DOMAIN][entry.entry_id]
+    scheduler = async_get_scheduler(hass)
+    return {
+        "entry": async_redact_data(entry.as_dict(), TO_REDACT),
+        "update": {
+            "last_update_success": coordinator.last_update_success,
+            "update_interval": str(coordinator.update_interval),
+            "metrics": coordinator.metrics.as_dict(),
+        },
+        # the client is shared by all entries of the account, so are its metrics
+        "api": {
+            "logged_in": coordinator.api.logged_in,
+            "circuit_breaker": coordinator.api.circuit_breaker.state,
+            "metrics": coordinator.api.metrics.as_dict(),
+        },
+        # shared by all entries, the requests of all accounts go through the same limiter
+        "scheduler": {
+            "slot_offset": round(scheduler.offset(entry.data[CONF_USERNAME]), 4),
+            "limiter": scheduler.limiter.as_dict(),
+        },
+    }
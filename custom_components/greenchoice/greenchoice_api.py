@@ -1,20 +1,55 @@
-from datetime import datetime
-from typing import List, Dict, Optional
-from urllib.parse import urlparse, parse_qs
+from __future__ import annotations
 
-import bs4
-import requests
-from requests import Session
+import asyncio
+import codecs
+import contextlib
+import hashlib
+import json
+import re
+import time
+from collections import deque
+from dataclasses import dataclass, fields
+from datetime import datetime, timedelta
+from html.parser import HTMLParser
+from http.cookies import SimpleCookie
+from operator import attrgetter
+from typing import Any, Callable, Generator, Iterable, List, Dict, Optional, Set
+
+import aiohttp
+from yarl import URL
 
 from .const import (
     API_URL,
+    CUSTOMER_CACHE_TTL_MINUTES,
     LOGGER,
-    MEASUREMENT_TYPES,
+    REQUEST_CHUNK_SIZE,
+    REQUEST_COALESCE_SECONDS,
+    REQUEST_CONNECT_TIMEOUT_SECONDS,
+    REQUEST_READ_TIMEOUT_SECONDS,
+    REQUEST_TOTAL_TIMEOUT_SECONDS,
+    RETRY_ATTEMPTS,
+    RETRY_STATUSES,
     SERVICE_METERSTAND_STROOM,
     SERVICE_METERSTAND_GAS,
     SERVICE_TARIEVEN,
-    MeasurementNames
+    SERVICE_VERBRUIK_STROOM,
+    SERVICE_VERBRUIK_GAS,
+    SERVICE_KOSTEN,
+    TARIEVEN_WAIT_SECONDS,
+    PERIODS,
+    TELWERK_MEASUREMENTS,
+    MeasurementNames,
+    meter_increment,
 )
+from .metrics import GreenchoiceMetrics
+from .retry import GreenchoiceCircuitBreaker, GreenchoiceRequestLimiter, backoff_delay
+
+
+OIDC_PARAMS = ("code", "scope", "state", "session_state")
+STROOM_MEASUREMENTS = (MeasurementNames.ENERGY_HIGH_IN, MeasurementNames.ENERGY_LOW_IN, MeasurementNames.ENERGY_HIGH_OUT, MeasurementNames.ENERGY_LOW_OUT)
+GAS_MEASUREMENTS = (MeasurementNames.GAS_IN,)
+# cookie attributes kept when exporting a session, max-age is left out as it would restart on import
+COOKIE_ATTRIBUTES = ("domain", "path", "expires", "secure", "httponly")
 
 
 class GreenchoiceOvereenkomst:
@@ -42,94 +77,602 @@ class GreenchoiceProducts:
         self.has_gas = address["heeftGasLevering"]
 
 
+# not frozen, a frozen dataclass is slower to create and the history can have thousands of readings
+@dataclass(slots=True)
+class GreenchoiceMeterReading:
+    datum: datetime
+    waarden: Dict[MeasurementNames, float]
+
+
+# The measurements of a service are fixed fields named after their MeasurementNames value, so the sensors can bind
+# an attribute getter for their key once instead of looking values up on every state update.
+
+@dataclass(frozen=True, slots=True)
+class GreenchoiceMeterstandStroom:
+    stroom_hoog_in: Optional[float] = None
+    stroom_laag_in: Optional[float] = None
+    stroom_hoog_uit: Optional[float] = None
+    stroom_laag_uit: Optional[float] = None
+    stroom_totaal_in: Optional[float] = None
+    stroom_totaal_uit: Optional[float] = None
+    measurement_date_electricity: Optional[datetime] = None
+
+
+@dataclass(frozen=True, slots=True)
+class GreenchoiceMeterstandGas:
+    gas_in: Optional[float] = None
+    measurement_date_gas: Optional[datetime] = None
+
+
+@dataclass(frozen=True, slots=True)
+class GreenchoiceTarieven:
+    tarief_stroom_laag_in: Optional[float] = None
+    tarief_stroom_laag_uit: Optional[float] = None
+    tarief_stroom_hoog_in: Optional[float] = None
+    tarief_stroom_hoog_uit: Optional[float] = None
+    tarief_stroom_terugleververgoeding: Optional[float] = None
+    tarief_gas_in: Optional[float] = None
+    kosten_stroom_jaar: Optional[float] = None
+    kosten_gas_jaar: Optional[float] = None
+    kosten_totaal_jaar: Optional[float] = None
+
+
+# Consumption within the day, week and month of the most recent reading. A reading is the meter state at the start of
+# its day, so the most recent reading completes the day before it: that is the day the periods are based on.
+
+@dataclass(frozen=True, slots=True)
+class GreenchoiceVerbruikStroom:
+    stroom_hoog_in_dag: Optional[float] = None
+    stroom_hoog_in_week: Optional[float] = None
+    stroom_hoog_in_maand: Optional[float] = None
+    stroom_laag_in_dag: Optional[float] = None
+    stroom_laag_in_week: Optional[float] = None
+    stroom_laag_in_maand: Optional[float] = None
+    stroom_hoog_uit_dag: Optional[float] = None
+    stroom_hoog_uit_week: Optional[float] = None
+    stroom_hoog_uit_maand: Optional[float] = None
+    stroom_laag_uit_dag: Optional[float] = None
+    stroom_laag_uit_week: Optional[float] = None
+    stroom_laag_uit_maand: Optional[float] = None
+    start_dag: Optional[datetime] = None
+    start_week: Optional[datetime] = None
+    start_maand: Optional[datetime] = None
+
+
+@dataclass(frozen=True, slots=True)
+class GreenchoiceVerbruikGas:
+    gas_in_dag: Optional[float] = None
+    gas_in_week: Optional[float] = None
+    gas_in_maand: Optional[float] = None
+    start_dag: Optional[datetime] = None
+    start_week: Optional[datetime] = None
+    start_maand: Optional[datetime] = None
+
+
+@dataclass(frozen=True, slots=True)
+class GreenchoiceKosten:
+    kosten_stroom_dag: Optional[float] = None
+    kosten_stroom_maand: Optional[float] = None
+    kosten_stroom_totaal: Optional[float] = None
+    kosten_gas_dag: Optional[float] = None
+    kosten_gas_maand: Optional[float] = None
+    kosten_gas_totaal: Optional[float] = None
+    start_dag: Optional[datetime] = None
+    start_maand: Optional[datetime] = None
+
+
+GreenchoiceMeasurement = (GreenchoiceMeterstandStroom | GreenchoiceMeterstandGas | GreenchoiceTarieven
+                          | GreenchoiceVerbruikStroom | GreenchoiceVerbruikGas | GreenchoiceKosten)
+
+SERVICE_KEYS = (SERVICE_METERSTAND_STROOM, SERVICE_METERSTAND_GAS, SERVICE_TARIEVEN, SERVICE_VERBRUIK_STROOM, SERVICE_VERBRUIK_GAS,
+                SERVICE_KOSTEN)
+
+
+def measurement_as_dict(measurement: GreenchoiceMeasurement) -> Dict[str, float | str | None]:
+    """Return the values of a measurement in a JSON compatible form."""
+    return {
+        field.name: value.isoformat() if isinstance(value, datetime) else value
+        for field in fields(measurement)
+        for value in (getattr(measurement, field.name),)
+    }
+
+
+def measurement_from_dict(measurement_type: type, values: Dict[str, float | str | None]) -> GreenchoiceMeasurement:
+    """Restore a measurement saved with measurement_as_dict, values that no longer exist are dropped."""
+    names = {field.name for field in fields(measurement_type)}
+    # the measurement dates are the only string values
+    return measurement_type(**{
+        key: datetime.fromisoformat(value) if isinstance(value, str) else value
+        for key, value in values.items() if key in names
+    })
+
+
+@dataclass(frozen=True, slots=True)
 class GreenchoiceApiData:
-    class Measurement(Dict[MeasurementNames, float | datetime]):
-        pass
+    meterstand_stroom: Optional[GreenchoiceMeterstandStroom]
+    meterstand_gas: Optional[GreenchoiceMeterstandGas]
+    tarieven: Optional[GreenchoiceTarieven]
+    # all readings of the account, oldest first
+    historie_stroom: Optional[List[GreenchoiceMeterReading]] = None
+    historie_gas: Optional[List[GreenchoiceMeterReading]] = None
+    # identifies the upstream responses the data was parsed from, equal fingerprints mean unchanged data
+    fingerprint: Optional[tuple] = None
+    verbruik_stroom: Optional[GreenchoiceVerbruikStroom] = None
+    verbruik_gas: Optional[GreenchoiceVerbruikGas] = None
+    # computed by the coordinator from the history and the tariffs
+    kosten: Optional[GreenchoiceKosten] = None
 
-    def __init__(self, meterstand_stroom: Measurement, meterstand_gas: Measurement, tarieven: Measurement) -> None:
-        self.meterstand_stroom = meterstand_stroom
-        self.meterstand_gas = meterstand_gas
-        self.tarieven = tarieven
+    def as_dict(self) -> Dict[str, Optional[Dict[str, float | str | None]]]:
+        """Return the current values of all services in a JSON compatible form, the history is left out."""
+        return {
+            service: None if measurement is None else measurement_as_dict(measurement)
+            for service in SERVICE_KEYS
+            for measurement in (getattr(self, service),)
+        }
+
+    def changed_measurements(self, previous: GreenchoiceApiData) -> Set[tuple[str, str]]:
+        """Return the (service, measurement) pairs with a different value than in the previous data."""
+        changed = set()
+        for service in SERVICE_KEYS:
+            current_values = getattr(self, service)
+            previous_values = getattr(previous, service)
+            # unchanged responses reuse the parsed measurement, which makes this the common case
+            if current_values is previous_values:
+                continue
+            if current_values is None or previous_values is None:
+                changed.update((service, field.name) for field in fields(current_values or previous_values))
+                continue
+            changed.update(
+                (service, field.name) for field in fields(current_values)
+                if getattr(current_values, field.name) != getattr(previous_values, field.name)
+            )
+        return changed
+
+    @staticmethod
+    def from_dict(values: Dict[str, Optional[Dict[str, float | str | None]]]) -> GreenchoiceApiData:
+        """Restore data saved with as_dict."""
+        def measurement(service: str, measurement_type: type) -> Optional[GreenchoiceMeasurement]:
+            return None if values.get(service) is None else measurement_from_dict(measurement_type, values[service])
 
-    def __getitem__(self, item):
-        if item not in [SERVICE_METERSTAND_STROOM, SERVICE_METERSTAND_GAS, SERVICE_TARIEVEN]:
-            raise GreenchoiceError(f"Unable to retrieve item with key {item}")
-        return self.__dict__[item]
+        return GreenchoiceApiData(
+            measurement(SERVICE_METERSTAND_STROOM, GreenchoiceMeterstandStroom),
+            measurement(SERVICE_METERSTAND_GAS, GreenchoiceMeterstandGas),
+            measurement(SERVICE_TARIEVEN, GreenchoiceTarieven),
+            verbruik_stroom=measurement(SERVICE_VERBRUIK_STROOM, GreenchoiceVerbruikStroom),
+            verbruik_gas=measurement(SERVICE_VERBRUIK_GAS, GreenchoiceVerbruikGas),
+            kosten=measurement(SERVICE_KOSTEN, GreenchoiceKosten),
+        )
+
+
+@dataclass(slots=True)
+class GreenchoiceMeterstanden:
+    meterstand_stroom: Optional[GreenchoiceMeterstandStroom]
+    meterstand_gas: Optional[GreenchoiceMeterstandGas]
+    historie_stroom: Optional[List[GreenchoiceMeterReading]]
+    historie_gas: Optional[List[GreenchoiceMeterReading]]
+    verbruik_stroom: Optional[GreenchoiceVerbruikStroom] = None
+    verbruik_gas: Optional[GreenchoiceVerbruikGas] = None
+    digest: Optional[bytes] = None
 
 
 class GreenchoiceError(Exception):
     pass
 
 
-class GreenchoiceApi:
+class GreenchoiceAuthError(GreenchoiceError):
+    """Greenchoice answered, but didn't accept the credentials."""
+
+
+class GreenchoiceFormInputParser(HTMLParser):
+    """Collects the values of named <input> elements, and stops parsing as soon as all of them are found."""
+
+    class _AllFound(Exception):
+        pass
+
+    def __init__(self, names: Iterable[str]) -> None:
+        super().__init__(convert_charrefs=True)
+        self._names = frozenset(names)
+        self.values: Dict[str, Optional[str]] = {}
+
+    def handle_starttag(self, tag, attrs):
+        if tag != 'input':
+            return
+        name = None
+        value = None
+        for attr_name, attr_value in attrs:
+            if attr_name == 'name' and name is None:
+                name = attr_value
+            elif attr_name == 'value' and value is None:
+                value = attr_value
+        # like BeautifulSoup.find, the first input with a name wins
+        if name in self._names and name not in self.values:
+            self.values[name] = value
+            if len(self.values) == len(self._names):
+                raise GreenchoiceFormInputParser._AllFound
+
+    @staticmethod
+    def parse(html_txt: str, names: Iterable[str]) -> Dict[str, Optional[str]]:
+        """Return the value of each named input that is present in the html."""
+        parser = GreenchoiceFormInputParser(names)
+        try:
+            parser.feed(html_txt)
+            parser.close()
+        except GreenchoiceFormInputParser._AllFound:
+            pass
+        return parser.values
+
+
+class GreenchoiceResponseChunks:
+    """A response body as the chunks it was received in, with a digest that is computed while receiving them.
+
+    The chunks aren't joined into a single copy of the body, and feeding them to a decoder releases each of them as
+    soon as it is decoded.
+    """
+
+    def __init__(self) -> None:
+        self._chunks: deque[bytes] = deque()
+        self._hash = hashlib.blake2b(digest_size=16)
+
+    def feed(self, chunk: bytes) -> None:
+        self._hash.update(chunk)
+        self._chunks.append(chunk)
+
+    def close(self) -> None:
+        pass
+
+    def digest(self) -> bytes:
+        return self._hash.digest()
+
+    def decode(self, decoder):
+        """Feed the chunks to the decoder and return the closed decoder."""
+        while self._chunks:
+            decoder.feed(self._chunks.popleft())
+        decoder.close()
+        return decoder
+
+
+class GreenchoiceOpnamesParser:
+    """Decodes an OpnamesOphalen response into meter readings, part by part.
+
+    Only the containers down to the individual opnames are walked here, each opname is decoded on its own and turned
+    into a GreenchoiceMeterReading straight away. The document is never held as nested dicts, so the memory used
+    stays close to the size of the readings themselves. The walk is a generator that suspends whenever it runs out of
+    data and resumes when the next part is fed.
+    """
+
+    _WHITESPACE = re.compile(r'[ \t\n\r]*')
+    _VALUE_END = frozenset(' \t\n\r,]}')
+
+    def __init__(self) -> None:
+        self.heeft_stroom: bool = False
+        self.heeft_gas: bool = False
+        # readings per product in the order of productenOpnamesModel, electricity first and gas second
+        self.historie: List[List[GreenchoiceMeterReading]] = []
+        # per product the most recent reading, and whether the readings arrived oldest first
+        self.newest: List[Optional[GreenchoiceMeterReading]] = []
+        self.in_order: List[bool] = []
+        self._text_decoder = codecs.getincrementaldecoder('utf-8')()
+        self._json_decoder = json.JSONDecoder()
+        self._buffer = ''
+        self._pos = 0
+        self._eof = False
+        self._walk: Optional[Generator[None, None, None]] = self.__document()
+
+    def feed(self, data: bytes) -> None:
+        """Decode the next part of the response."""
+        self.__resume(self.__decode_text(data))
+
+    def close(self) -> GreenchoiceOpnamesParser:
+        """Finish decoding, raises a JSONDecodeError when the response was incomplete or invalid."""
+        self._eof = True
+        self.__resume(self.__decode_text(b'', final=True))
+        if self._walk is not None:
+            raise self.__error('Unexpected end of document')
+        return self
+
+    def __decode_text(self, data: bytes, final: bool = False) -> str:
+        try:
+            return self._text_decoder.decode(data, final)
+        except UnicodeDecodeError as e:
+            # invalid like any other malformed document, so its callers only have to handle the JSONDecodeError
+            raise self.__error(f'Invalid UTF-8: {e.reason}') from e
+
+    def __resume(self, text: str) -> None:
+        # the positions are relative to the buffer, which only keeps the part that wasn't decoded yet
+        self._buffer = self._buffer[self._pos:] + text
+        self._pos = 0
+        if self._walk is not None:
+            try:
+                next(self._walk)
+            except StopIteration:
+                self._walk = None
+        if self._walk is None:
+            # only whitespace may follow the document
+            self._pos = self._WHITESPACE.match(self._buffer, self._pos).end()
+            if self._pos < len(self._buffer):
+                raise self.__error('Extra data')
+
+    def __error(self, message: str) -> json.JSONDecodeError:
+        return json.JSONDecodeError(message, self._buffer, self._pos)
+
+    def __skip(self):
+        """Skip whitespace and return the next character, waiting for more data when the buffer runs out."""
+        while True:
+            self._pos = self._WHITESPACE.match(self._buffer, self._pos).end()
+            if self._pos < len(self._buffer):
+                return self._buffer[self._pos]
+            if self._eof:
+                raise self.__error('Unexpected end of document')
+            yield
+
+    def __expect(self, char: str):
+        if (yield from self.__skip()) != char:
+            raise self.__error(f'Expecting {char!r}')
+        self._pos += 1
+
+    def __end_of_member(self, closing: str):
+        """Consume the separator after a member or element, return whether it closed the container."""
+        char = yield from self.__skip()
+        if char != closing and char != ',':
+            raise self.__error(f'Expecting \',\' or {closing!r}')
+        self._pos += 1
+        return char == closing
+
+    def __value(self):
+        """Decode the complete value at the current position."""
+        yield from self.__skip()
+        while True:
+            try:
+                value, end = self._json_decoder.raw_decode(self._buffer, self._pos)
+            except json.JSONDecodeError:
+                if self._eof:
+                    raise
+            else:
+                # a number or literal is only complete when it's followed by a separator, otherwise it may continue in
+                # the next part, like 12.5 split after its "."
+                if self._eof or self._buffer[end - 1] in '"]}' or (end < len(self._buffer) and self._buffer[end] in self._VALUE_END):
+                    self._pos = end
+                    return value
+            yield
+
+    def __object(self, members: Dict[str, Callable[[], Generator]]):
+        """Walk an object, the members with a handler are walked by it and the others are decoded and returned."""
+        values = {}
+        if (yield from self.__skip()) == 'n':
+            yield from self.__value()
+            return values
+        yield from self.__expect('{')
+        if (yield from self.__skip()) == '}':
+            self._pos += 1
+            return values
+        while True:
+            key = yield from self.__value()
+            yield from self.__expect(':')
+            handler = members.get(key)
+            if handler is None:
+                values[key] = yield from self.__value()
+            else:
+                yield from handler()
+            if (yield from self.__end_of_member('}')):
+                return values
+
+    def __array(self, element: Callable[[], Generator]):
+        """Walk an array, every element is walked by element."""
+        if (yield from self.__skip()) == 'n':
+            yield from self.__value()
+            return
+        yield from self.__expect('[')
+        if (yield from self.__skip()) == ']':
+            self._pos += 1
+            return
+        while True:
+            yield from element()
+            if (yield from self.__end_of_member(']')):
+                return
+
+    def __document(self):
+        yield from self.__object({'model': self.__model})
 
-    def __init__(self, username: str, password: str) -> None:
+    def __model(self):
+        values = yield from self.__object({'productenOpnamesModel': lambda: self.__array(self.__product)})
+        self.heeft_stroom = bool(values.get('heeftStroom'))
+        self.heeft_gas = bool(values.get('heeftGas'))
+
+    def __product(self):
+        product = len(self.historie)
+        self.historie.append([])
+        self.newest.append(None)
+        self.in_order.append(True)
+        month = {'opnames': lambda: self.__array(lambda: self.__opname(product))}
+        yield from self.__object({'opnamesJaarMaandModel': lambda: self.__array(lambda: self.__object(month))})
+
+    def __opname(self, product: int):
+        opname = yield from self.__value()
+        waarden = {TELWERK_MEASUREMENTS[stand['telwerk']]: stand['waarde'] for stand in opname['standen'] if stand['telwerk'] in TELWERK_MEASUREMENTS}
+        reading = GreenchoiceMeterReading(datetime.fromisoformat(opname['opnameDatum']), waarden)
+        self.historie[product].append(reading)
+        newest = self.newest[product]
+        if newest is None or reading.datum >= newest.datum:
+            self.newest[product] = reading
+        else:
+            self.in_order[product] = False
+
+
+class GreenchoiceAsyncApi:
+
+    def __init__(self, session: aiohttp.ClientSession, username: str, password: str, base_url: str = API_URL) -> None:
+        self.session: aiohttp.ClientSession = session
         self.username: str = username
         self.password: str = password
-        self.session: Optional[Session] = None
+        self.base_url: str = base_url
+        self.metrics = GreenchoiceMetrics()
+        self.timeout = aiohttp.ClientTimeout(total=REQUEST_TOTAL_TIMEOUT_SECONDS, connect=REQUEST_CONNECT_TIMEOUT_SECONDS,
+                                             sock_read=REQUEST_READ_TIMEOUT_SECONDS)
+        self.circuit_breaker = GreenchoiceCircuitBreaker()
+        # limits the requests together with other clients, every request of the client takes part
+        self.limiter: Optional[GreenchoiceRequestLimiter] = None
+        self.logged_in: bool = False
+        self._login_lock = asyncio.Lock()
+        # identical requests share a single request while it runs, and its response for coalesce_seconds after it
+        self.coalesce_seconds: float = REQUEST_COALESCE_SECONDS
+        self._requests_in_flight: Dict[tuple, asyncio.Future] = {}
+        self._recent_responses: Dict[tuple, tuple[float, bytes]] = {}
+        self._login_generation: int = 0
+        # customer details from /microbus/init hardly ever change, they are cached between updates
+        self._customer: Optional[Dict] = None
+        self._addresses: Optional[List[Dict]] = None
+        self._addresses_expiry: float = 0
+        # seconds during which the account wide meter readings are reused, see async_get_meterstanden
+        self.meterstanden_max_age: float = 0
+        self._meterstanden = None
+        self._meterstanden_time: float = 0
+        self._meterstanden_lock = asyncio.Lock()
+        # digest of the last tariff response and the parsed tariffs, per overeenkomst
+        self._tarieven: Dict[int, tuple[bytes, GreenchoiceTarieven]] = {}
+        # seconds during which the tariffs of an overeenkomst aren't fetched again, they hardly ever change
+        self.tarieven_max_age: float = 0
+        self._tarieven_time: Dict[int, float] = {}
+        self.tarieven_wait: float = TARIEVEN_WAIT_SECONDS
+        # tariff requests that outlive the update that started them, see async_get_update
+        self._tarieven_requests: set[asyncio.Future] = set()
 
-    def login(self):
-        self.session = self.__get_session()
+    async def async_login(self):
+        self.metrics.increment('logins')
+        with self.metrics.time('login'):
+            await self.__async_login()
+        self.logged_in = True
+        self._login_generation += 1
+
+    async def __async_relogin(self, expired_generation: int):
+        # concurrent requests share a single (re)login instead of each starting their own
+        async with self._login_lock:
+            if self.logged_in and self._login_generation != expired_generation:
+                return
+            await self.async_logout()
+            await self.async_login()
+
+    async def async_logout(self):
+        self.session.cookie_jar.clear()
+        self.logged_in = False
+
+    async def async_close(self):
+        """Cancel the requests still running in the background, before the session is released."""
+        # the coalesced requests are shielded from their callers, they are cancelled separately
+        requests = [*self._tarieven_requests, *self._requests_in_flight.values()]
+        for request in requests:
+            request.cancel()
+        await asyncio.gather(*requests, return_exceptions=True)
+
+    def export_cookies(self) -> List[Dict[str, str]]:
+        """Return the cookies of the current session, to restore it later with import_cookies."""
+        if not self.logged_in:
+            return []
+        return [
+            {"key": morsel.key, "value": morsel.value, **{attribute: morsel[attribute] for attribute in COOKIE_ATTRIBUTES if morsel[attribute]}}
+            for morsel in self.session.cookie_jar
+        ]
+
+    def import_cookies(self, cookies: List[Dict[str, str]]) -> None:
+        """Restore a session exported with export_cookies.
+
+        The session isn't checked here, the first request validates it: an expired session is detected like any
+        other expiry and triggers a normal login.
+        """
+        self.session.cookie_jar.clear()
+        base_url = URL(self.base_url)
+        for cookie in cookies:
+            simple_cookie = SimpleCookie()
+            simple_cookie[cookie["key"]] = cookie["value"]
+            for attribute in COOKIE_ATTRIBUTES:
+                if attribute in cookie:
+                    simple_cookie[cookie["key"]][attribute] = cookie[attribute]
+            # the cookie jar only accepts cookies for the host they are received from
+            domain = cookie.get("domain")
+            self.session.cookie_jar.update_cookies(simple_cookie, base_url.with_host(domain) if domain else base_url)
+        self.logged_in = bool(cookies)
 
     @staticmethod
     def __get_verification_token(html_txt: str):
-        soup = bs4.BeautifulSoup(html_txt, "html.parser")
-        token_elem = soup.find("input", {"name": "__RequestVerificationToken"})
+        values = GreenchoiceFormInputParser.parse(html_txt, ("__RequestVerificationToken",))
+        if "__RequestVerificationToken" not in values:
+            error = "Login page doesn't contain a verification token"
+            LOGGER.error(error)
+            raise (GreenchoiceAuthError(error))
 
-        return token_elem.attrs.get("value")
+        return values["__RequestVerificationToken"]
 
     @staticmethod
     def __get_oidc_params(html_txt: str):
-        soup = bs4.BeautifulSoup(html_txt, "html.parser")
-
-        code_elem = soup.find("input", {"name": "code"})
-        scope_elem = soup.find("input", {"name": "scope"})
-        state_elem = soup.find("input", {"name": "state"})
-        session_state_elem = soup.find("input", {"name": "session_state"})
+        values = GreenchoiceFormInputParser.parse(html_txt, OIDC_PARAMS)
 
-        if not (code_elem and scope_elem and state_elem and session_state_elem):
+        if len(values) != len(OIDC_PARAMS):
             error = "Login failed, check your credentials?"
             LOGGER.error(error)
-            raise (GreenchoiceError(error))
+            raise (GreenchoiceAuthError(error))
 
         return {
-            "code": code_elem.attrs.get("value"),
-            "scope": scope_elem.attrs.get("value").replace(" ", "+"),
-            "state": state_elem.attrs.get("value"),
-            "session_state": session_state_elem.attrs.get("value")
+            "code": values["code"],
+            "scope": (values["scope"] or "").replace(" ", "+"),
+            "state": values["state"],
+            "session_state": values["session_state"]
         }
 
-    def __get_session(self) -> Session:
+    async def __async_login(self):
         if not self.username or not self.password:
             error = "Username or password not set"
             LOGGER.error(error)
-            raise (GreenchoiceError(error))
-        sess: Session = requests.Session()
-
-        # first, get the login cookies and form data
-        login_page = sess.get(API_URL)
-
-        login_url = login_page.url
-        return_url = parse_qs(urlparse(login_url).query).get("ReturnUrl", "")
-        token = GreenchoiceApi.__get_verification_token(login_page.text)
-
-        # perform actual sign in
-        login_data = {
-            "ReturnUrl": return_url,
-            "Username": self.username,
-            "Password": self.password,
-            "__RequestVerificationToken": token,
-            "RememberLogin": True
-        }
-        auth_page = sess.post(login_page.url, data=login_data)
+            raise (GreenchoiceAuthError(error))
+        self.session.cookie_jar.clear()
+
+        try:
+            # first, get the login cookies and form data
+            async with self.__limit(), self.session.get(self.base_url, timeout=self.timeout) as login_page:
+                login_url = login_page.url
+                login_page_html = await login_page.text()
+
+            return_url = login_url.query.get("ReturnUrl", "")
+            token = GreenchoiceAsyncApi.__get_verification_token(login_page_html)
 
-        # exchange oidc params for a login cookie (automatically saved in session)
-        oidc_params = GreenchoiceApi.__get_oidc_params(auth_page.text)
-        sess.post("https://mijn.greenchoice.nl/signin-oidc", data=oidc_params)
-        return sess
+            # perform actual sign in
+            login_data = {
+                "ReturnUrl": return_url,
+                "Username": self.username,
+                "Password": self.password,
+                "__RequestVerificationToken": token,
+                "RememberLogin": "True"
+            }
+            async with self.__limit(), self.session.post(login_url, data=login_data, timeout=self.timeout) as auth_page:
+                auth_page_html = await auth_page.text()
+
+            # exchange oidc params for a login cookie (automatically saved in the cookie jar)
+            oidc_params = GreenchoiceAsyncApi.__get_oidc_params(auth_page_html)
+            async with self.__limit(), self.session.post(self.base_url + "/signin-oidc", data=oidc_params, timeout=self.timeout):
+                pass
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            raise GreenchoiceError(f"Login request failed: {e}") from e
+
+    def __limit(self):
+        return self.limiter if self.limiter is not None else contextlib.nullcontext()
+
+    def invalidate_cache(self):
+        self._customer = None
+        self._addresses = None
+        self._addresses_expiry = 0
+        self._recent_responses.clear()
+
+    def __has_cached_addresses(self) -> bool:
+        return self._addresses is not None and time.monotonic() < self._addresses_expiry
+
+    async def __async_get_addresses(self) -> List[Dict]:
+        if self.__has_cached_addresses():
+            self.metrics.increment('customer_cache_hits')
+            return self._addresses
+
+        self.metrics.increment('customer_cache_misses')
+        init_data = await self.__async_request_json('GET', '/microbus/init', phase='microbus_init')
+        if init_data is None:
+            raise GreenchoiceError("Unable to retrieve customer details")
 
-    def __get_addresses(self) -> List[Dict]:
-        init_data = self.session.get("https://mijn.greenchoice.nl/microbus/init").json()
         customer_number = init_data["profile"]["voorkeursOvereenkomst"]["klantnummer"]
         customer = next((customer for customer in init_data["klantgegevens"]
                          if customer["klantnummer"] == customer_number), None)
@@ -138,46 +681,174 @@ class GreenchoiceApi:
             LOGGER.error(error)
             raise (GreenchoiceError(error))
 
-        return list(filter(lambda addr: addr['heeftLevering'], customer["adressen"]))
+        self._customer = customer
+        self._addresses = list(filter(lambda addr: addr['heeftLevering'], customer["adressen"]))
+        self._addresses_expiry = time.monotonic() + CUSTOMER_CACHE_TTL_MINUTES * 60
+        return self._addresses
 
-    def get_overeenkomsten(self) -> List[GreenchoiceOvereenkomst]:
-        addresses = self.__get_addresses()
+    async def async_get_overeenkomsten(self) -> List[GreenchoiceOvereenkomst]:
+        addresses = await self.__async_get_addresses()
         return [GreenchoiceOvereenkomst(address.get("postcode", ""), address.get("huisnummer", None), address.get("plaats").capitalize(), address["overeenkomstId"]) for address in addresses]
 
-    def get_products(self, overeenkomst_id: int) -> GreenchoiceProducts:
-        addresses = self.__get_addresses()
+    async def async_get_products(self, overeenkomst_id: int) -> GreenchoiceProducts:
+        from_cache = self.__has_cached_addresses()
+        addresses = await self.__async_get_addresses()
         address = next((address for address in addresses if address['overeenkomstId'] == overeenkomst_id), None)
+        if address is None and from_cache:
+            # the set of contracts changed since the customer details were cached
+            LOGGER.debug(f"Overeenkomst '{overeenkomst_id}' not in cached customer details, refreshing")
+            self.invalidate_cache()
+            addresses = await self.__async_get_addresses()
+            address = next((address for address in addresses if address['overeenkomstId'] == overeenkomst_id), None)
         if address is None:
             raise GreenchoiceError(f"Unable to find overeenkomst '{overeenkomst_id}'")
         return GreenchoiceProducts(address)
 
-    def __request(self, method, endpoint, data=None, _retry_count=1):
+    async def __async_request_json(self, method, endpoint, data=None, phase=None) -> Optional[dict]:
+        body = await self.__async_request(method, endpoint, data, phase)
+        if body is None:
+            return None
+        with self.metrics.time('json_decode'):
+            return json.loads(body)
+
+    async def __async_request(self, method, endpoint, data=None, phase=None, sink: Callable[[], Any] = None) -> Any:
+        """Return the response body of a request, or None when it failed.
+
+        Identical requests are coalesced: callers that make a request that is already running wait for its response,
+        and callers right behind it get the same response for coalesce_seconds. A streamed body is consumed
+        by its caller, those requests are always sent.
+        """
+        if sink is not None:
+            return await self.__async_send(method, endpoint, data, phase, sink)
+
+        key = (method, endpoint, json.dumps(data, sort_keys=True))
+        recent = self._recent_responses.get(key)
+        if recent is not None and time.monotonic() - recent[0] < self.coalesce_seconds:
+            self.metrics.increment('requests_coalesced')
+            return recent[1]
+        in_flight = self._requests_in_flight.get(key)
+        if in_flight is not None:
+            self.metrics.increment('requests_coalesced')
+        else:
+            in_flight = self._requests_in_flight[key] = asyncio.ensure_future(self.__async_send(method, endpoint, data, phase))
+            in_flight.add_done_callback(lambda task: self.__request_done(key, task))
+        # a cancelled caller doesn't cancel the request for the others
+        return await asyncio.shield(in_flight)
+
+    def __request_done(self, key: tuple, task: asyncio.Future) -> None:
+        self._requests_in_flight.pop(key, None)
+        if task.cancelled() or task.exception() is not None or task.result() is None:
+            return
+        now = time.monotonic()
+        for expired in [other for other, (received, _) in self._recent_responses.items() if now - received >= self.coalesce_seconds]:
+            del self._recent_responses[expired]
+        self._recent_responses[key] = now, task.result()
+
+    async def __async_send(self, method, endpoint, data=None, phase=None, sink: Callable[[], Any] = None) -> Any:
+        """Send a request and return the response body, or None when it failed.
+
+        Connection errors, timeouts and 429 or 5xx responses are retried with exponential backoff, an expired session
+        is re-authenticated once. Requests that keep failing open the circuit breaker, after which requests fail
+        immediately until Greenchoice had some time to recover.
+
+        With a sink factory the body is streamed into a new sink through its feed and close methods instead of being
+        read as a whole, and the sink is returned.
+        """
         LOGGER.debug(f'Request: {method} {endpoint}')
-        try:
-            target_url = API_URL + endpoint
-            r = self.session.request(method, target_url, json=data)
+        # whether this request is the single trial request of a half open circuit breaker
+        trial = self.circuit_breaker.state == GreenchoiceCircuitBreaker.HALF_OPEN
+        if not self.circuit_breaker.allow_request():
+            self.metrics.increment('circuit_open')
+            raise GreenchoiceError(f'Greenchoice is unavailable, requests are paused for {self.circuit_breaker.remaining:.0f} seconds')
 
-            if r.status_code == 403 or len(r.history) > 1:  # sometimes we get redirected on token expiry
-                LOGGER.debug('Access cookie expired, triggering refresh')
+        try:
+            if not self.logged_in:
+                LOGGER.debug('No active session, logging in')
                 try:
-                    return self.__request(method, endpoint, data, _retry_count)
+                    await self.__async_relogin(self._login_generation)
+                except GreenchoiceAuthError:
+                    # rejected credentials are no outage, Greenchoice answered
+                    self.circuit_breaker.record_success()
+                    raise
                 except GreenchoiceError:
-                    LOGGER.error('Login failed! Please check your credentials and try again.')
-                    return None
+                    self.circuit_breaker.record_failure()
+                    raise
 
-            r.raise_for_status()
-        except requests.HTTPError as e:
-            LOGGER.error(f'HTTP Error: {e}')
-            LOGGER.error([c.name for c in self.session.cookies])
-            if _retry_count == 0:
-                return None
+            target_url = self.base_url + endpoint
+            relogged_in = False
+            attempt = 0
+            while True:
+                login_generation = self._login_generation
+                try:
+                    # only the request itself is timed, not the wait for the limiter, and a login it triggers is timed separately
+                    async with self.__limit():
+                        with self.metrics.time(phase or endpoint):
+                            async with self.session.request(method, target_url, json=data, timeout=self.timeout) as r:
+                                # sometimes we get redirected on token expiry
+                                session_expired = r.status == 403 or len(r.history) > 1
+                                if not session_expired:
+                                    r.raise_for_status()
+                                    if sink is None:
+                                        body = await r.read()
+                                    else:
+                                        # a new sink for every attempt, a failed attempt leaves a partly fed one behind
+                                        body = sink()
+                                        async for chunk in r.content.iter_chunked(REQUEST_CHUNK_SIZE):
+                                            body.feed(chunk)
+                                        body.close()
+                                    self.circuit_breaker.record_success()
+                                    return body
+                except aiohttp.ClientResponseError as e:
+                    if e.status not in RETRY_STATUSES:
+                        # Greenchoice is up but rejects the request, repeating it won't help
+                        LOGGER.error(f'HTTP Error: {e}')
+                        self.circuit_breaker.record_success()
+                        return None
+                    error = str(e)
+                except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                    error = str(e) or type(e).__name__
+                else:
+                    # authentication failures take their own path, they are not retried with backoff
+                    self.circuit_breaker.record_success()
+                    self.metrics.increment('session_expired')
+                    if relogged_in:
+                        LOGGER.error('Session expired again directly after logging in')
+                        return None
+                    LOGGER.debug('Access cookie expired, triggering refresh')
+                    try:
+                        await self.__async_relogin(login_generation)
+                    except GreenchoiceAuthError:
+                        LOGGER.error('Login failed! Please check your credentials and try again.')
+                        self.circuit_breaker.record_success()
+                        return None
+                    except GreenchoiceError as e:
+                        LOGGER.error(f'Login failed: {e}')
+                        self.circuit_breaker.record_failure()
+                        return None
+                    relogged_in = True
+                    continue
 
-            LOGGER.debug('Retrying request')
-            return self.__request(method, endpoint, data, _retry_count - 1)
+                attempt += 1
+                if attempt >= RETRY_ATTEMPTS:
+                    LOGGER.error(f'Request {method} {endpoint} failed after {attempt} attempts: {error}')
+                    self.metrics.increment('failed_requests')
+                    self.circuit_breaker.record_failure()
+                    return None
+
+                delay = backoff_delay(attempt)
+                LOGGER.debug(f'Request {method} {endpoint} failed ({error}), retrying in {delay:.1f} seconds')
+                self.metrics.increment('retries')
+                await asyncio.sleep(delay)
+        finally:
+            if trial:
+                # a trial that was cancelled or failed unexpectedly has no outcome, the next request is the trial
+                self.circuit_breaker.release_trial()
 
-        return r
+    async def __async_microbus_request(self, name, message=None, chunked: bool = False) -> tuple[bytes | GreenchoiceResponseChunks, bytes]:
+        """Return the raw response body of a microbus request, and a digest of it to detect unchanged responses.
 
-    def __microbus_request(self, name, message=None):
+        A chunked body is kept as the received chunks and digested while it is received, for large responses.
+        """
         if not message:
             message = {}
 
@@ -185,111 +856,227 @@ class GreenchoiceApi:
             'name': name,
             'message': message
         }
-        response = self.__request('POST', '/microbus/request', payload)
+        response = await self.__async_request('POST', '/microbus/request', payload, f'microbus_{name}',
+                                              GreenchoiceResponseChunks if chunked else None)
         if not response:
             raise ConnectionError
 
-        return response.json()
+        if chunked:
+            return response, response.digest()
+        return response, hashlib.blake2b(response, digest_size=16).digest()
 
-    @staticmethod
-    def __get_most_recent_entries(values):
-        current_month = sorted(filter(lambda v: 'opnames' in v and len(v['opnames']) > 0, values), key=lambda m: (m['jaar'], m['maand']), reverse=True)[0]
-        if not current_month or len(current_month['opnames']) == 0:
+    async def async_get_update(self, overeenkomst_id: int, stroom_enabled: bool = True, gas_enabled: bool = True, tarieven_enabled: bool = True) -> Optional[GreenchoiceApiData]:
+        products = await self.async_get_products(overeenkomst_id)
+        stroom_enabled = products.has_power and stroom_enabled
+        gas_enabled = products.has_gas and gas_enabled
+
+        # meter readings and tariffs don't depend on each other, fetch and parse them concurrently
+        tarieven_request = asyncio.ensure_future(self.__async_get_tarieven(overeenkomst_id, products, tarieven_enabled))
+        self._tarieven_requests.add(tarieven_request)
+        tarieven_request.add_done_callback(self._tarieven_requests.discard)
+        try:
+            if stroom_enabled or gas_enabled:
+                meterstanden = await self.async_get_meterstanden()
+            else:
+                meterstanden = GreenchoiceMeterstanden(None, None, None, None)
+        except BaseException:
+            tarieven_request.cancel()
+            raise
+        if meterstanden is None:
+            # the tariff request goes on, its result is kept for the next update
             return None
 
-        return sorted(
-            current_month['opnames'],
-            key=lambda d: datetime.strptime(d['opnameDatum'], '%Y-%m-%dT%H:%M:%S'),
-            reverse=True
-        )[0]
+        try:
+            # slow tariffs don't hold back the meter readings, the request goes on and the next update gets its result
+            tarieven = await asyncio.wait_for(asyncio.shield(tarieven_request), self.tarieven_wait)
+        except asyncio.TimeoutError:
+            LOGGER.warning('Tariff values are taking long, using the previous ones')
+            self.metrics.increment('tarieven_late')
+            tarieven = self._tarieven.get(overeenkomst_id)
+            if tarieven is not None and not tarieven[0].endswith(bytes((products.has_power, products.has_gas))):
+                tarieven = None
 
-    def get_update(self, overeenkomst_id: int, stroom_enabled: bool = True, gas_enabled: bool = True, tarieven_enabled: bool = True) -> Optional[GreenchoiceApiData]:
-        meterstand_stroom = None
-        meterstand_gas = None
-        tarieven = None
+        tarieven_digest, tarieven = tarieven or (None, None)
+        return GreenchoiceApiData(
+            meterstanden.meterstand_stroom if stroom_enabled else None,
+            meterstanden.meterstand_gas if gas_enabled else None,
+            tarieven,
+            meterstanden.historie_stroom if stroom_enabled else None,
+            meterstanden.historie_gas if gas_enabled else None,
+            fingerprint=(meterstanden.digest if stroom_enabled or gas_enabled else None, tarieven_digest, stroom_enabled, gas_enabled),
+            verbruik_stroom=meterstanden.verbruik_stroom if stroom_enabled else None,
+            verbruik_gas=meterstanden.verbruik_gas if gas_enabled else None,
+        )
+
+    async def async_get_meterstanden(self) -> Optional[GreenchoiceMeterstanden]:
+        """Return the latest electricity and gas readings of the account.
 
-        products = self.get_products(overeenkomst_id)
+        The readings are account wide, when meterstanden_max_age is set a recent result is shared between the
+        updates of all contracts instead of fetching the same payload for each of them. Concurrent calls always share
+        a single request, and calls right behind it its result, like other coalesced requests.
+        """
+        async with self._meterstanden_lock:
+            max_age = max(self.meterstanden_max_age, self.coalesce_seconds)
+            if self._meterstanden is not None and time.monotonic() - self._meterstanden_time < max_age:
+                self.metrics.increment('meterstanden_shared')
+                return self._meterstanden
 
-        if (products.has_power and stroom_enabled) or (products.has_gas and gas_enabled):
             LOGGER.debug('Retrieving meter values')
             try:
-                monthly_values = self.__microbus_request('OpnamesOphalen')
-            except requests.exceptions.JSONDecodeError | ConnectionError:
+                # the history of a long standing account is megabytes of JSON, it is decoded chunk by chunk
+                response, digest = await self.__async_microbus_request('OpnamesOphalen', chunked=True)
+                if self._meterstanden is not None and self._meterstanden.digest == digest:
+                    LOGGER.debug('Meter values unchanged, reusing the previous result')
+                    self.metrics.increment('meterstanden_unchanged')
+                else:
+                    def parse() -> GreenchoiceMeterstanden:
+                        # parse energy and gas data
+                        with self.metrics.time('parse_opnames'):
+                            return GreenchoiceAsyncApi.__parse_opnames(response.decode(GreenchoiceOpnamesParser()))
+
+                    # decoding years of readings takes long enough to hold up the event loop, it runs in the executor
+                    self._meterstanden = await asyncio.get_running_loop().run_in_executor(None, parse)
+                    self._meterstanden.digest = digest
+            except (json.JSONDecodeError, ConnectionError):
                 LOGGER.error('Could not update meter values: request failed or returned no valid JSON', exc_info=True)
-                return
+                return None
 
-            if products.has_power and stroom_enabled:
-                # parse energy data
-                meterstand_stroom = GreenchoiceApi.__parse_meterstand_stroom(monthly_values)
-            if products.has_gas and gas_enabled:
-                # process gas
-                meterstand_gas = GreenchoiceApi.__parse_meterstand_gas(monthly_values)
+            self._meterstanden_time = time.monotonic()
+            return self._meterstanden
 
-        if tarieven_enabled:
-            try:
-                tariff_values = self.__microbus_request('GetTariefOvereenkomst', message={"overeenkomstId": overeenkomst_id})
-            except requests.exceptions.JSONDecodeError:
-                LOGGER.error('Could not update tariff values: request failed or returned no valid JSON')
-                return
+    async def __async_get_tarieven(self, overeenkomst_id: int, products: GreenchoiceProducts, tarieven_enabled: bool) -> Optional[tuple[bytes, GreenchoiceTarieven]]:
+        if not tarieven_enabled:
+            return None
+
+        products_flags = bytes((products.has_power, products.has_gas))
+        previous = self._tarieven.get(overeenkomst_id)
+        if (previous is not None and previous[0].endswith(products_flags)
+                and time.monotonic() - self._tarieven_time[overeenkomst_id] < self.tarieven_max_age):
+            self.metrics.increment('tarieven_cached')
+            return previous
 
+        LOGGER.debug('Retrieving tariff values')
+        try:
+            response, digest = await self.__async_microbus_request('GetTariefOvereenkomst', message={"overeenkomstId": overeenkomst_id})
+            digest += products_flags
+            self._tarieven_time[overeenkomst_id] = time.monotonic()
+            if previous is not None and previous[0] == digest:
+                LOGGER.debug('Tariff values unchanged, reusing the previous result')
+                self.metrics.increment('tarieven_unchanged')
+                return previous
+
+            with self.metrics.time('json_decode'):
+                tariff_values = json.loads(response)
             # process tarieven
-            tarieven = GreenchoiceApi.__parse_tarieven(tariff_values, products)
-        return GreenchoiceApiData(meterstand_stroom, meterstand_gas, tarieven)
+            with self.metrics.time('parse_tarieven'):
+                self._tarieven[overeenkomst_id] = digest, GreenchoiceAsyncApi.__parse_tarieven(tariff_values, products)
+        except (json.JSONDecodeError, ConnectionError, GreenchoiceError):
+            # a failing tariff request shouldn't hold back the meter readings
+            LOGGER.error('Could not update tariff values: request failed or returned no valid JSON')
+            return None
+
+        return self._tarieven[overeenkomst_id]
 
     @staticmethod
-    def __parse_meterstand_stroom(monthly_values: dict) -> Optional[GreenchoiceApiData.Measurement]:
-        if not monthly_values['model']['heeftStroom']:
+    def __parse_opnames(opnames: GreenchoiceOpnamesParser) -> GreenchoiceMeterstanden:
+        historie_stroom, current_day_stroom = GreenchoiceAsyncApi.__parse_historie(opnames, 0) if opnames.heeft_stroom else (None, None)
+        historie_gas, current_day_gas = GreenchoiceAsyncApi.__parse_historie(opnames, 1) if opnames.heeft_gas else (None, None)
+
+        return GreenchoiceMeterstanden(
+            GreenchoiceAsyncApi.__parse_meterstand_stroom(opnames.heeft_stroom, current_day_stroom),
+            GreenchoiceAsyncApi.__parse_meterstand_gas(opnames.heeft_gas, current_day_gas),
+            historie_stroom,
+            historie_gas,
+            GreenchoiceVerbruikStroom(**GreenchoiceAsyncApi.__parse_verbruik(historie_stroom, STROOM_MEASUREMENTS)) if historie_stroom else None,
+            GreenchoiceVerbruikGas(**GreenchoiceAsyncApi.__parse_verbruik(historie_gas, GAS_MEASUREMENTS)) if historie_gas else None,
+        )
+
+    @staticmethod
+    def __parse_verbruik(historie: List[GreenchoiceMeterReading], measurements: Iterable[MeasurementNames]) -> Dict[str, float | datetime | None]:
+        """Derive the consumption per day, week and month from the history, oldest reading first.
+
+        Walks back from the most recent reading and sums the increments between consecutive readings, so a replaced
+        meter that restarts from zero or a corrected reading doesn't produce a negative consumption. The walk stops at
+        the oldest period start, which is at most a month and a week back.
+        """
+        latest = historie[-1]
+        day = (latest.datum - timedelta(days=1)).replace(hour=0, minute=0, second=0, microsecond=0)
+        starts = dict(zip(PERIODS, (day, day - timedelta(days=day.weekday()), day.replace(day=1))))
+        verbruik: Dict[str, float | datetime | None] = {f"start_{period}": start for period, start in starts.items()}
+
+        totals = dict.fromkeys(measurements, 0.0)
+        newer = latest.waarden
+        pending = dict(starts)
+        for reading in reversed(historie):
+            for measurement in totals:
+                newer_value = newer.get(measurement)
+                value = reading.waarden.get(measurement)
+                if newer_value is not None and value is not None:
+                    totals[measurement] += meter_increment(value, newer_value)
+            newer = reading.waarden
+
+            for period, start in list(pending.items()):
+                if reading.datum <= start:
+                    # the last reading at or before the start of the period is the meter state the period started with
+                    verbruik.update((f"{measurement}_{period}", round(total, 3)) for measurement, total in totals.items())
+                    del pending[period]
+            if not pending:
+                break
+
+        return verbruik
+
+    @staticmethod
+    def __parse_historie(opnames: GreenchoiceOpnamesParser, product: int) -> tuple[List[GreenchoiceMeterReading], Optional[GreenchoiceMeterReading]]:
+        """Return the readings of a product oldest first, and the most recent one."""
+        historie = opnames.historie[product]
+        if not opnames.in_order[product]:
+            # the history is only sorted when a reading arrived out of order, the most recent one is known already
+            historie.sort(key=attrgetter('datum'))
+        return historie, opnames.newest[product]
+
+    @staticmethod
+    def __parse_meterstand_stroom(heeft_stroom: bool, current_day: Optional[GreenchoiceMeterReading]) -> Optional[GreenchoiceMeterstandStroom]:
+        if not heeft_stroom:
             LOGGER.info("Not parsing electricity meter, contract doesn't have electricity")
             return None
 
-        electricity_values = monthly_values['model']['productenOpnamesModel'][0]['opnamesJaarMaandModel']
-        current_day = GreenchoiceApi.__get_most_recent_entries(electricity_values)
         if current_day is None:
             LOGGER.error('Could not update meter values: No current values for electricity found')
             return None
 
-        meterstand_stroom = GreenchoiceApiData.Measurement()
-        for measurement in current_day['standen']:
-            measurement_type = MEASUREMENT_TYPES[measurement['telwerk']]
-            match measurement_type:
-                case 'consumption_high':
-                    meterstand_stroom[MeasurementNames.ENERGY_HIGH_IN] = measurement['waarde']
-                case 'consumption_low':
-                    meterstand_stroom[MeasurementNames.ENERGY_LOW_IN] = measurement['waarde']
-                case 'return_high':
-                    meterstand_stroom[MeasurementNames.ENERGY_HIGH_OUT] = measurement['waarde']
-                case 'return_low':
-                    meterstand_stroom[MeasurementNames.ENERGY_LOW_OUT] = measurement['waarde']
-
-        meterstand_stroom[MeasurementNames.ENERGY_TOTAL_IN] = meterstand_stroom[MeasurementNames.ENERGY_HIGH_IN] + meterstand_stroom[MeasurementNames.ENERGY_LOW_IN]
-        meterstand_stroom[MeasurementNames.ENERGY_TOTAL_OUT] = meterstand_stroom[MeasurementNames.ENERGY_HIGH_OUT] + meterstand_stroom[MeasurementNames.ENERGY_LOW_OUT]
-
-        meterstand_stroom[MeasurementNames.ENERGY_MEASUREMENT_DATE] = datetime.strptime(current_day['opnameDatum'], '%Y-%m-%dT%H:%M:%S')
-        return meterstand_stroom
+        waarden = current_day.waarden
+        high_in = waarden.get(MeasurementNames.ENERGY_HIGH_IN)
+        low_in = waarden.get(MeasurementNames.ENERGY_LOW_IN)
+        high_out = waarden.get(MeasurementNames.ENERGY_HIGH_OUT)
+        low_out = waarden.get(MeasurementNames.ENERGY_LOW_OUT)
+        return GreenchoiceMeterstandStroom(
+            stroom_hoog_in=high_in,
+            stroom_laag_in=low_in,
+            stroom_hoog_uit=high_out,
+            stroom_laag_uit=low_out,
+            stroom_totaal_in=high_in + low_in if high_in is not None and low_in is not None else None,
+            stroom_totaal_uit=high_out + low_out if high_out is not None and low_out is not None else None,
+            measurement_date_electricity=current_day.datum,
+        )
 
     @staticmethod
-    def __parse_meterstand_gas(monthly_values: dict) -> Optional[GreenchoiceApiData.Measurement]:
-        if not monthly_values['model']['heeftGas']:
+    def __parse_meterstand_gas(heeft_gas: bool, current_day: Optional[GreenchoiceMeterReading]) -> Optional[GreenchoiceMeterstandGas]:
+        if not heeft_gas:
             LOGGER.info("Not parsing gas meter, contract doesn't have gas")
             return None
 
-        gas_values = monthly_values['model']['productenOpnamesModel'][1]['opnamesJaarMaandModel']
-        current_day = GreenchoiceApi.__get_most_recent_entries(gas_values)
         if current_day is None:
             LOGGER.error('Could not update meter values: No current values for gas found')
             return None
 
-        meterstand_gas = GreenchoiceApiData.Measurement()
-        measurement = current_day['standen'][0]
-        if measurement['telwerk'] == 5:
-            meterstand_gas[MeasurementNames.GAS_IN] = measurement['waarde']
-
-        meterstand_gas[MeasurementNames.GAS_MEASUREMENT_DATE] = datetime.strptime(current_day['opnameDatum'], '%Y-%m-%dT%H:%M:%S')
-        return meterstand_gas
+        return GreenchoiceMeterstandGas(
+            gas_in=current_day.waarden.get(MeasurementNames.GAS_IN),
+            measurement_date_gas=current_day.datum,
+        )
 
     @staticmethod
-    def __parse_tarieven(tariff_values: dict, products: GreenchoiceProducts) -> GreenchoiceApiData.Measurement:
-        tarieven = GreenchoiceApiData.Measurement()
+    def __parse_tarieven(tariff_values: dict, products: GreenchoiceProducts) -> GreenchoiceTarieven:
+        tarieven = {}
         if products.has_power:
             tarieven[MeasurementNames.PRICE_ENERGY_LOW_IN] = tariff_values['stroom']['leveringLaagAllin']
             tarieven[MeasurementNames.PRICE_ENERGY_LOW_OUT] = tariff_values['stroom']['terugleveringLaagAllin']
@@ -302,4 +1089,52 @@ class GreenchoiceApi:
             tarieven[MeasurementNames.COST_GAS_YEARLY] = tariff_values['gas']['totaleJaarlijkseKostenIncBtw']
 
         tarieven[MeasurementNames.COST_TOTAL_YEARLY] = (tarieven.get(MeasurementNames.COST_ENERGY_YEARLY) or 0) + (tarieven.get(MeasurementNames.COST_GAS_YEARLY) or 0)
-        return tarieven
+        return GreenchoiceTarieven(**tarieven)
+
+
+class GreenchoiceApi:
+    """Blocking wrapper around GreenchoiceAsyncApi, for use outside of an event loop."""
+
+    def __init__(self, username: str, password: str, base_url: str = API_URL) -> None:
+        self.username: str = username
+        self.password: str = password
+        self.base_url: str = base_url
+        self._loop = asyncio.new_event_loop()
+        self._api: Optional[GreenchoiceAsyncApi] = None
+
+    def __enter__(self) -> GreenchoiceApi:
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def __run(self, method: str, *args):
+        async def run():
+            if self._api is None:
+                self._api = GreenchoiceAsyncApi(aiohttp.ClientSession(), self.username, self.password, self.base_url)
+            return await getattr(self._api, method)(*args)
+
+        return self._loop.run_until_complete(run())
+
+    def login(self):
+        self.__run('async_login')
+
+    def logout(self):
+        if self._api is not None:
+            self.__run('async_logout')
+
+    def close(self):
+        if self._api is not None:
+            self._loop.run_until_complete(self._api.async_close())
+            self._loop.run_until_complete(self._api.session.close())
+            self._api = None
+        self._loop.close()
+
+    def get_overeenkomsten(self) -> List[GreenchoiceOvereenkomst]:
+        return self.__run('async_get_overeenkomsten')
+
+    def get_products(self, overeenkomst_id: int) -> GreenchoiceProducts:
+        return self.__run('async_get_products', overeenkomst_id)
+
+    def get_update(self, overeenkomst_id: int, stroom_enabled: bool = True, gas_enabled: bool = True, tarieven_enabled: bool = True) -> Optional[GreenchoiceApiData]:
+        return self.__run('async_get_update', overeenkomst_id, stroom_enabled, gas_enabled, tarieven_enabled)
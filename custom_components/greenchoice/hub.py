@@ -0,0 +1,136 @@
+"""Shared connection to a Greenchoice account, used by all config entries of the same user."""
+from __future__ import annotations
+
+import asyncio
+import hashlib
+from typing import Any
+
+from aiohttp import ClientSession
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.aiohttp_client import async_create_clientsession
+from homeassistant.helpers.storage import Store
+
+from .const import (
+    DATA_HUBS,
+    DOMAIN,
+    LOGGER,
+    SESSION_SAVE_DELAY_SECONDS,
+    SHARED_METERSTANDEN_MAX_AGE_SECONDS,
+    STORAGE_KEY_SESSION,
+    STORAGE_VERSION,
+    TARIEVEN_MAX_AGE_SECONDS,
+)
+from .greenchoice_api import GreenchoiceAsyncApi
+from .scheduler import async_get_scheduler
+
+
+def account_key(username: str) -> str:
+    """Return the key of an account, Greenchoice accepts the username (an e-mail address) in any case."""
+    return username.lower()
+
+
+def session_store(hass: HomeAssistant, username: str) -> Store:
+    """Return the store with the session cookies of an account, keyed by a hash to keep the username out of the file name."""
+    account = hashlib.sha256(account_key(username).encode()).hexdigest()[:16]
+    return Store(hass, STORAGE_VERSION, f"{STORAGE_KEY_SESSION}.{account}", private=True)
+
+
+@callback
+def async_create_session(hass: HomeAssistant) -> ClientSession:
+    """Return a client session with its own cookie jar, on the pooled keep-alive connector of Home Assistant.
+
+    The login cookies stay out of the cookie jar shared by other integrations. The session isn't released with a
+    config entry, its owner releases it with async_release_session.
+    """
+    return async_create_clientsession(hass, auto_cleanup=False)
+
+
+@callback
+def async_release_session(session: ClientSession) -> None:
+    """Release a session created with async_create_session."""
+    # the connector is shared with Home Assistant, a session it created is released by detaching it
+    session.detach()
+
+
+class GreenchoiceHub:
+    """Single login and API client for one Greenchoice account."""
+
+    def __init__(self, hass: HomeAssistant, username: str, password: str) -> None:
+        """Initialize the hub."""
+        self.username = username
+        # released when the hub closes, not when the entry that happened to create it unloads, the other entries of
+        # the account still use it
+        self._session = async_create_session(hass)
+        self.api = GreenchoiceAsyncApi(self._session, username, password)
+        # the meter readings are account wide, fetch them once for all contracts polled around the same time
+        self.api.meterstanden_max_age = SHARED_METERSTANDEN_MAX_AGE_SECONDS
+        # tariff changes are recorded in the tariff history, checking once a day is often enough
+        self.api.tarieven_max_age = TARIEVEN_MAX_AGE_SECONDS
+        # the requests of all accounts together are limited, so many entries don't overload Greenchoice
+        self.api.limiter = async_get_scheduler(hass).limiter
+        self.entry_ids: set[str] = set()
+        # the session cookies survive restarts, so setting up the entries doesn't have to wait for a full login
+        self._store = session_store(hass, username)
+        self._session_lock = asyncio.Lock()
+        self._session_restored = False
+
+    async def async_restore_session(self) -> None:
+        """Restore the saved session cookies, once for all entries of the account."""
+        async with self._session_lock:
+            if self._session_restored:
+                return
+            self._session_restored = True
+            stored = await self._store.async_load()
+            if stored and stored.get("cookies") and not self.api.logged_in:
+                LOGGER.debug("Restoring saved Greenchoice session")
+                self.api.import_cookies(stored["cookies"])
+
+    def _session_data(self) -> dict[str, Any]:
+        return {"cookies": self.api.export_cookies()}
+
+    @callback
+    def async_schedule_save_session(self) -> None:
+        """Save the session cookies in a while, the cookies can change with every response."""
+        self._store.async_delay_save(self._session_data, SESSION_SAVE_DELAY_SECONDS)
+
+    async def async_close(self) -> None:
+        """Save the session, cancel the requests still running, log out and release the client session."""
+        if self.api.logged_in:
+            await self._store.async_save(self._session_data())
+        await self.api.async_close()
+        await self.api.async_logout()
+        async_release_session(self._session)
+
+
+@callback
+def async_find_hub(hass: HomeAssistant, username: str) -> GreenchoiceHub | None:
+    """Return the hub for an account when config entries use it."""
+    return hass.data.get(DOMAIN, {}).get(DATA_HUBS, {}).get(account_key(username))
+
+
+@callback
+def async_get_hub(hass: HomeAssistant, username: str, password: str) -> GreenchoiceHub:
+    """Get the hub for an account, creating it when it doesn't exist yet."""
+    hubs: dict[str, GreenchoiceHub] = hass.data.setdefault(DOMAIN, {}).setdefault(DATA_HUBS, {})
+    hub = hubs.get(account_key(username))
+    if hub is None:
+        LOGGER.debug("Creating hub for Greenchoice account")
+        hub = hubs[account_key(username)] = GreenchoiceHub(hass, username, password)
+    elif hub.api.password != password:
+        # the most recently configured password wins, it is used on the next login
+        hub.api.password = password
+    return hub
+
+
+async def async_release_hub(hass: HomeAssistant, username: str, entry_id: str) -> None:
+    """Release the hub for a config entry, closing it once no config entries use it anymore."""
+    hubs: dict[str, GreenchoiceHub] = hass.data.get(DOMAIN, {}).get(DATA_HUBS, {})
+    hub = hubs.get(account_key(username))
+    if hub is None:
+        return
+
+    hub.entry_ids.discard(entry_id)
+    if not hub.entry_ids:
+        LOGGER.debug("Closing hub for Greenchoice account")
+        hubs.pop(account_key(username))
+        await hub.async_close()
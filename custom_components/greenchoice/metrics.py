@@ -0,0 +1,73 @@
+"""Timings and counters of the hot paths of the Greenchoice integration."""
+from __future__ import annotations
+
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator
+
+from .const import METRICS_WINDOW_SIZE
+
+
+class GreenchoiceMetrics:
+    """Rolling timings per phase and plain counters.
+
+    Each phase keeps the durations of its most recent runs, from which the percentiles are computed on request so
+    recording a timing stays cheap.
+    """
+
+    def __init__(self, window_size: int = METRICS_WINDOW_SIZE) -> None:
+        """Initialize the metrics."""
+        self._window_size = window_size
+        self._timings: Dict[str, deque[float]] = {}
+        self.counters: Dict[str, int] = {}
+
+    @contextmanager
+    def time(self, phase: str) -> Iterator[None]:
+        """Time the enclosed block as a run of phase."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(phase, time.perf_counter() - start)
+
+    def record(self, phase: str, seconds: float) -> None:
+        """Record the duration of a run of phase."""
+        timings = self._timings.get(phase)
+        if timings is None:
+            timings = self._timings[phase] = deque(maxlen=self._window_size)
+        timings.append(seconds)
+
+    def increment(self, counter: str, amount: int = 1) -> None:
+        """Increase a counter."""
+        self.counters[counter] = self.counters.get(counter, 0) + amount
+
+    def last(self, phase: str) -> float | None:
+        """Duration of the most recent run of phase in milliseconds."""
+        timings = self._timings.get(phase)
+        return round(timings[-1] * 1000, 1) if timings else None
+
+    def percentile(self, phase: str, percentile: float) -> float | None:
+        """Percentile of the recent durations of phase in milliseconds."""
+        timings = self._timings.get(phase)
+        if not timings:
+            return None
+        ordered = sorted(timings)
+        index = min(len(ordered) - 1, int(len(ordered) * percentile / 100))
+        return round(ordered[index] * 1000, 1)
+
+    def as_dict(self) -> Dict[str, Any]:
+        """All timings and counters, for diagnostics."""
+        return {
+            "timings_ms": {
+                phase: {
+                    "runs": len(timings),
+                    "last": self.last(phase),
+                    "p50": self.percentile(phase, 50),
+                    "p90": self.percentile(phase, 90),
+                    "p99": self.percentile(phase, 99),
+                }
+                for phase, timings in self._timings.items()
+            },
+            "counters": dict(self.counters),
+        }
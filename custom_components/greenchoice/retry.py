@@ -0,0 +1,147 @@
+"""Retry backoff, circuit breaker and rate limiting for the requests to Greenchoice."""
+from __future__ import annotations
+
+import asyncio
+import random
+import time
+from typing import Any, Dict
+
+from .const import (
+    CIRCUIT_BREAKER_FAILURE_THRESHOLD,
+    CIRCUIT_BREAKER_RESET_SECONDS,
+    REQUEST_BURST,
+    REQUEST_MAX_CONCURRENT,
+    REQUEST_RATE_PER_SECOND,
+    RETRY_BACKOFF_BASE_SECONDS,
+    RETRY_BACKOFF_MAX_SECONDS,
+)
+
+
+def backoff_delay(attempt: int, base: float = RETRY_BACKOFF_BASE_SECONDS, cap: float = RETRY_BACKOFF_MAX_SECONDS) -> float:
+    """Seconds to wait before retrying after the given number of failed attempts.
+
+    Exponential backoff with full jitter, so clients that failed at the same moment don't retry in lockstep.
+    """
+    return random.uniform(0, min(cap, base * 2 ** (attempt - 1)))
+
+
+class GreenchoiceCircuitBreaker:
+    """Stops sending requests for a while after repeated failures.
+
+    The breaker opens after failure_threshold consecutive failed requests, while open requests fail immediately.
+    After reset_timeout seconds a single trial request is let through (half open), its outcome either closes the
+    breaker again or keeps it open for another reset_timeout.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int = CIRCUIT_BREAKER_FAILURE_THRESHOLD, reset_timeout: float = CIRCUIT_BREAKER_RESET_SECONDS) -> None:
+        """Initialize the circuit breaker."""
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures: int = 0
+        self._opened_at: float | None = None
+        self._trial_running: bool = False
+
+    @property
+    def state(self) -> str:
+        if self._opened_at is None:
+            return self.CLOSED
+        if self.remaining > 0:
+            return self.OPEN
+        return self.HALF_OPEN
+
+    @property
+    def remaining(self) -> float:
+        """Seconds until a trial request is let through again."""
+        if self._opened_at is None:
+            return 0
+        return max(0.0, self._opened_at + self.reset_timeout - time.monotonic())
+
+    def allow_request(self) -> bool:
+        """Whether a request may be sent now, in half open state only a single trial request is allowed."""
+        state = self.state
+        if state == self.CLOSED:
+            return True
+        if state == self.OPEN or self._trial_running:
+            return False
+        self._trial_running = True
+        return True
+
+    def record_success(self) -> None:
+        """Greenchoice answered, close the breaker."""
+        self.failures = 0
+        self._opened_at = None
+        self._trial_running = False
+
+    def release_trial(self) -> None:
+        """The trial request ended without an outcome, let the next request be the trial."""
+        self._trial_running = False
+
+    def record_failure(self) -> None:
+        """A request failed for good, open the breaker once the failures reach the threshold."""
+        self.failures += 1
+        self._trial_running = False
+        if self.failures >= self.failure_threshold:
+            self._opened_at = time.monotonic()
+
+
+class GreenchoiceRequestLimiter:
+    """Limits the requests of any number of clients together, used as an async context manager around a request.
+
+    At most max_concurrent requests run at a time, and requests start at no more than rate per second on average
+    with bursts of up to burst requests (token bucket). Requests waiting for a token are served in order.
+    """
+
+    def __init__(self, max_concurrent: int = REQUEST_MAX_CONCURRENT, rate: float = REQUEST_RATE_PER_SECOND, burst: int = REQUEST_BURST) -> None:
+        """Initialize the request limiter."""
+        self.max_concurrent = max_concurrent
+        self.rate = rate
+        self.burst = burst
+        self.waits: int = 0
+        self._semaphore = asyncio.Semaphore(max_concurrent)
+        self._running: int = 0
+        self._tokens: float = burst
+        self._updated: float = time.monotonic()
+        self._token_lock = asyncio.Lock()
+
+    async def __aenter__(self) -> None:
+        await self._semaphore.acquire()
+        try:
+            await self.__async_take_token()
+        except BaseException:
+            self._semaphore.release()
+            raise
+        self._running += 1
+
+    async def __aexit__(self, *exc_info) -> None:
+        self._running -= 1
+        self._semaphore.release()
+
+    async def __async_take_token(self) -> None:
+        async with self._token_lock:
+            self.__refill()
+            if self._tokens < 1:
+                self.waits += 1
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+                self.__refill()
+            self._tokens -= 1
+
+    def __refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def as_dict(self) -> Dict[str, Any]:
+        """Current state of the limiter, for diagnostics."""
+        self.__refill()
+        return {
+            "running": self._running,
+            "max_concurrent": self.max_concurrent,
+            "tokens": round(self._tokens, 2),
+            "rate_per_second": self.rate,
+            "burst": self.burst,
+            "waits": self.waits,
+        }
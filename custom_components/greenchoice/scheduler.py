@@ -0,0 +1,162 @@
+"""Polling schedules for the Greenchoice data update coordinators."""
+from __future__ import annotations
+
+import hashlib
+import math
+from collections import deque
+from datetime import date, datetime, timedelta
+from typing import Any, Dict
+
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.storage import Store
+
+from .const import (
+    ADAPTIVE_LATE_INTERVAL_MINUTES,
+    ADAPTIVE_MAX_INTERVAL_MINUTES,
+    ADAPTIVE_MIN_INTERVAL_MINUTES,
+    ADAPTIVE_WINDOW_AFTER_MINUTES,
+    ADAPTIVE_WINDOW_BEFORE_MINUTES,
+    DATA_SCHEDULER,
+    DEFAULT_SCAN_INTERVAL_MINUTES,
+    DOMAIN,
+    LOGGER,
+    STORAGE_KEY_SCHEDULE,
+    STORAGE_VERSION,
+)
+from .greenchoice_api import GreenchoiceApiData
+from .retry import GreenchoiceRequestLimiter
+
+
+def schedule_store(hass: HomeAssistant, entry_id: str) -> Store:
+    """Return the store with the learned adaptive schedule of a config entry."""
+    return Store(hass, STORAGE_VERSION, f"{STORAGE_KEY_SCHEDULE}.{entry_id}")
+
+
+class GreenchoiceAdaptiveSchedule:
+    """Learns when Greenchoice usually publishes a new reading and polls around that time.
+
+    Greenchoice publishes about one reading a day. Once the reading of today is in, polling backs off until shortly
+    before the expected publish time of tomorrow. Within the publish window it polls every few minutes, and when the
+    reading is later than usual it falls back to a relaxed interval. What it learned is kept with as_dict and
+    restore, so a restart doesn't have to learn the publish time again.
+    """
+
+    def __init__(self, history_size: int = 14) -> None:
+        """Initialize the schedule."""
+        self._measurement_date: datetime | None = None
+        self._published_on: date | None = None
+        # minutes after midnight at which a new reading was first seen, for the most recent days
+        self._publish_minutes: deque[int] = deque(maxlen=history_size)
+
+    @property
+    def expected_publish_minute(self) -> int | None:
+        """Usual publish time as minutes after midnight, the median of the observed publish times."""
+        if not self._publish_minutes:
+            return None
+        observed = sorted(self._publish_minutes)
+        return observed[len(observed) // 2]
+
+    def as_dict(self) -> Dict[str, Any]:
+        """Return what the schedule learned, to store it."""
+        return {
+            "measurement_date": self._measurement_date.isoformat() if self._measurement_date else None,
+            "published_on": self._published_on.isoformat() if self._published_on else None,
+            "publish_minutes": list(self._publish_minutes),
+        }
+
+    def restore(self, stored: Dict[str, Any]) -> None:
+        """Continue from what the schedule learned before, as returned by as_dict."""
+        self._measurement_date = datetime.fromisoformat(stored["measurement_date"]) if stored["measurement_date"] else None
+        self._published_on = date.fromisoformat(stored["published_on"]) if stored["published_on"] else None
+        self._publish_minutes.clear()
+        self._publish_minutes.extend(stored["publish_minutes"])
+
+    def next_interval(self, data: GreenchoiceApiData, now: datetime) -> timedelta:
+        """Register the result of an update done at local time now, and return the time until the next update."""
+        measurement_date = self.__latest_measurement_date(data)
+        if measurement_date is not None and (self._measurement_date is None or measurement_date > self._measurement_date):
+            if self._measurement_date is not None:
+                # only a change observed by polling tells when readings get published
+                self._publish_minutes.append(now.hour * 60 + now.minute)
+                self._published_on = now.date()
+            self._measurement_date = measurement_date
+
+        interval = self.__interval(now)
+        LOGGER.debug(f"Next adaptive update in {interval}")
+        return interval
+
+    def retry_interval(self, now: datetime) -> timedelta:
+        """Return the time until the next update after an update at local time now failed."""
+        interval = self.__interval(now)
+        LOGGER.debug(f"Next adaptive update after a failed update in {interval}")
+        return interval
+
+    def __interval(self, now: datetime) -> timedelta:
+        expected = self.expected_publish_minute
+        if expected is None:
+            return timedelta(minutes=DEFAULT_SCAN_INTERVAL_MINUTES)
+
+        midnight = now.replace(hour=0, minute=0, second=0, microsecond=0)
+        window_start = midnight + timedelta(minutes=expected - ADAPTIVE_WINDOW_BEFORE_MINUTES)
+        window_end = midnight + timedelta(minutes=expected + ADAPTIVE_WINDOW_AFTER_MINUTES)
+
+        if self._published_on == now.date():
+            # today's reading is in, wait for the publish window of tomorrow
+            interval = window_start + timedelta(days=1) - now
+        elif now < window_start:
+            interval = window_start - now
+        elif now <= window_end:
+            interval = timedelta(minutes=ADAPTIVE_MIN_INTERVAL_MINUTES)
+        else:
+            # later than usual, keep checking at a relaxed pace
+            interval = timedelta(minutes=ADAPTIVE_LATE_INTERVAL_MINUTES)
+
+        return min(max(interval, timedelta(minutes=ADAPTIVE_MIN_INTERVAL_MINUTES)), timedelta(minutes=ADAPTIVE_MAX_INTERVAL_MINUTES))
+
+    @staticmethod
+    def __latest_measurement_date(data: GreenchoiceApiData) -> datetime | None:
+        dates = [
+            measurement_date
+            for measurement_date in (data.meterstand_stroom and data.meterstand_stroom.measurement_date_electricity,
+                                     data.meterstand_gas and data.meterstand_gas.measurement_date_gas)
+            if measurement_date is not None
+        ]
+        return max(dates, default=None)
+
+
+class GreenchoicePollScheduler:
+    """Spreads the polls of all config entries over their interval, and limits their requests to Greenchoice.
+
+    Every account polls in its own slots: points in time a period apart, at an offset within the period derived from
+    a hash of the account. The offsets are the same after every restart and don't depend on the other accounts, so
+    the accounts are spread evenly over the period on average. The entries of an account share its slots, their
+    polls coincide and share the account wide meter readings. All requests of all accounts go through one limiter.
+    """
+
+    def __init__(self) -> None:
+        """Initialize the poll scheduler."""
+        self.limiter = GreenchoiceRequestLimiter()
+
+    @staticmethod
+    def offset(account: str) -> float:
+        """Offset of the slots of an account, as a fraction of the period."""
+        digest = hashlib.sha256(account.lower().encode()).digest()
+        return int.from_bytes(digest[:8], "big") / 2 ** 64
+
+    def next_interval(self, account: str, now: datetime, earliest: timedelta, period: timedelta) -> timedelta:
+        """Time from now until the first slot of the account at least earliest from now, with slots period apart."""
+        period_seconds = period.total_seconds()
+        offset = self.offset(account) * period_seconds
+        earliest_timestamp = now.timestamp() + earliest.total_seconds()
+        slot = math.ceil((earliest_timestamp - offset) / period_seconds) * period_seconds + offset
+        return timedelta(seconds=slot - now.timestamp())
+
+
+@callback
+def async_get_scheduler(hass: HomeAssistant) -> GreenchoicePollScheduler:
+    """Get the poll scheduler shared by all config entries, creating it when it doesn't exist yet."""
+    domain_data = hass.data.setdefault(DOMAIN, {})
+    scheduler = domain_data.get(DATA_SCHEDULER)
+    if scheduler is None:
+        scheduler = domain_data[DATA_SCHEDULER] = GreenchoicePollScheduler()
+    return scheduler
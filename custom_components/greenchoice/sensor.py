@@ -1,8 +1,9 @@
-from datetime import datetime, date
-from decimal import Decimal
+from collections.abc import Callable
+from dataclasses import dataclass
+from datetime import datetime
+from operator import attrgetter
 from typing import Literal, Iterable
 
-from homeassistant.components.dsmr_reader.definitions import PRICE_EUR_KWH, PRICE_EUR_M3
 from homeassistant.components.sensor import (
     DOMAIN as SENSOR_DOMAIN,
     SensorDeviceClass,
@@ -11,20 +12,31 @@ from homeassistant.components.sensor import (
     SensorEntityDescription,
 )
 from homeassistant.config_entries import ConfigEntry
-from homeassistant.const import (ENERGY_KILO_WATT_HOUR, VOLUME_CUBIC_METERS, CURRENCY_EURO)
-from homeassistant.core import HomeAssistant
+from homeassistant.const import (ENERGY_KILO_WATT_HOUR, VOLUME_CUBIC_METERS, CURRENCY_EURO, TIME_MILLISECONDS)
+from homeassistant.core import HomeAssistant, callback
 from homeassistant.helpers.device_registry import DeviceEntryType
-from homeassistant.helpers.entity import DeviceInfo
+from homeassistant.helpers.dispatcher import async_dispatcher_connect
+from homeassistant.helpers.entity import DeviceInfo, EntityCategory
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
 from homeassistant.helpers.typing import StateType
 from homeassistant.helpers.update_coordinator import CoordinatorEntity
+from homeassistant.util import dt as dt_util
 
-from . import GreenchoiceDataUpdateCoordinator
 from .const import (
     DOMAIN,
+    PRICE_EUR_KWH,
+    PRICE_EUR_M3,
     SERVICE_METERSTAND_STROOM,
     SERVICE_METERSTAND_GAS,
     SERVICE_TARIEVEN,
+    SERVICE_VERBRUIK_STROOM,
+    SERVICE_VERBRUIK_GAS,
+    SERVICE_KOSTEN,
+    SERVICE_DIAGNOSTIEK,
+    PERIOD_DAY,
+    PERIOD_WEEK,
+    PERIOD_MONTH,
+    SIGNAL_METRICS_UPDATED,
     MANUFACTURER,
     SERVICES,
     MeasurementNames,
@@ -32,6 +44,8 @@ from .const import (
     CONF_METERSTAND_GAS_ENABLED,
     CONF_TARIEVEN_ENABLED,
 )
+from .coordinator import GreenchoiceDataUpdateCoordinator
+from .metrics import GreenchoiceMetrics
 
 SENSORS_POWER: tuple[SensorEntityDescription, ...] = (
     SensorEntityDescription(
@@ -174,6 +188,163 @@ SENSORS_TARIFFS_GAS: tuple[SensorEntityDescription, ...] = (
 )
 
 
+@dataclass
+class GreenchoicePeriodSensorEntityDescription(SensorEntityDescription):
+    """Describes a Greenchoice consumption or cost sensor, which resets at the start of its period.
+
+    Without a period the sensor is a running total that never resets.
+    """
+
+    period: str | None = PERIOD_DAY
+
+
+def _consumption_sensors(measurements: tuple[tuple[MeasurementNames, MeasurementNames, MeasurementNames, str, str], ...],
+                         unit: str, device_class: SensorDeviceClass) -> tuple[GreenchoicePeriodSensorEntityDescription, ...]:
+    return tuple(
+        GreenchoicePeriodSensorEntityDescription(
+            key=key,
+            name=f"{name} {period_name}",
+            icon=icon,
+            native_unit_of_measurement=unit,
+            device_class=device_class,
+            state_class=SensorStateClass.TOTAL,
+            period=period,
+        )
+        for *keys, name, icon in measurements
+        for key, period, period_name in zip(keys, (PERIOD_DAY, PERIOD_WEEK, PERIOD_MONTH), ("laatste dag", "deze week", "deze maand"))
+    )
+
+
+SENSORS_CONSUMPTION_POWER: tuple[GreenchoicePeriodSensorEntityDescription, ...] = _consumption_sensors(
+    (
+        (MeasurementNames.ENERGY_HIGH_IN_DAY, MeasurementNames.ENERGY_HIGH_IN_WEEK, MeasurementNames.ENERGY_HIGH_IN_MONTH,
+         "Energie levering hoog tarief", "mdi:weather-sunset-up"),
+        (MeasurementNames.ENERGY_LOW_IN_DAY, MeasurementNames.ENERGY_LOW_IN_WEEK, MeasurementNames.ENERGY_LOW_IN_MONTH,
+         "Energie levering laag tarief", "mdi:weather-sunset-down"),
+        (MeasurementNames.ENERGY_HIGH_OUT_DAY, MeasurementNames.ENERGY_HIGH_OUT_WEEK, MeasurementNames.ENERGY_HIGH_OUT_MONTH,
+         "Energie teruglevering hoog tarief", "mdi:solar-power"),
+        (MeasurementNames.ENERGY_LOW_OUT_DAY, MeasurementNames.ENERGY_LOW_OUT_WEEK, MeasurementNames.ENERGY_LOW_OUT_MONTH,
+         "Energie teruglevering laag tarief", "mdi:solar-power"),
+    ),
+    ENERGY_KILO_WATT_HOUR,
+    SensorDeviceClass.ENERGY,
+)
+
+SENSORS_CONSUMPTION_GAS: tuple[GreenchoicePeriodSensorEntityDescription, ...] = _consumption_sensors(
+    (
+        (MeasurementNames.GAS_IN_DAY, MeasurementNames.GAS_IN_WEEK, MeasurementNames.GAS_IN_MONTH,
+         "Gas consumptie", "mdi:gas-cylinder"),
+    ),
+    VOLUME_CUBIC_METERS,
+    SensorDeviceClass.GAS,
+)
+
+SENSORS_COSTS_POWER: tuple[GreenchoicePeriodSensorEntityDescription, ...] = (
+    GreenchoicePeriodSensorEntityDescription(
+        key=MeasurementNames.COST_ENERGY_DAY,
+        name="Kosten stroom laatste dag",
+        icon="mdi:currency-eur",
+        native_unit_of_measurement=CURRENCY_EURO,
+        device_class=SensorDeviceClass.MONETARY,
+        state_class=SensorStateClass.TOTAL,
+        period=PERIOD_DAY,
+    ),
+    GreenchoicePeriodSensorEntityDescription(
+        key=MeasurementNames.COST_ENERGY_MONTH,
+        name="Kosten stroom deze maand",
+        icon="mdi:currency-eur",
+        native_unit_of_measurement=CURRENCY_EURO,
+        device_class=SensorDeviceClass.MONETARY,
+        state_class=SensorStateClass.TOTAL,
+        period=PERIOD_MONTH,
+    ),
+    GreenchoicePeriodSensorEntityDescription(
+        key=MeasurementNames.COST_ENERGY_TOTAL,
+        name="Kosten stroom totaal",
+        icon="mdi:currency-eur",
+        native_unit_of_measurement=CURRENCY_EURO,
+        device_class=SensorDeviceClass.MONETARY,
+        state_class=SensorStateClass.TOTAL,
+        period=None,
+    ),
+)
+
+SENSORS_COSTS_GAS: tuple[GreenchoicePeriodSensorEntityDescription, ...] = (
+    GreenchoicePeriodSensorEntityDescription(
+        key=MeasurementNames.COST_GAS_DAY,
+        name="Kosten gas laatste dag",
+        icon="mdi:currency-eur",
+        native_unit_of_measurement=CURRENCY_EURO,
+        device_class=SensorDeviceClass.MONETARY,
+        state_class=SensorStateClass.TOTAL,
+        period=PERIOD_DAY,
+    ),
+    GreenchoicePeriodSensorEntityDescription(
+        key=MeasurementNames.COST_GAS_MONTH,
+        name="Kosten gas deze maand",
+        icon="mdi:currency-eur",
+        native_unit_of_measurement=CURRENCY_EURO,
+        device_class=SensorDeviceClass.MONETARY,
+        state_class=SensorStateClass.TOTAL,
+        period=PERIOD_MONTH,
+    ),
+    GreenchoicePeriodSensorEntityDescription(
+        key=MeasurementNames.COST_GAS_TOTAL,
+        name="Kosten gas totaal",
+        icon="mdi:currency-eur",
+        native_unit_of_measurement=CURRENCY_EURO,
+        device_class=SensorDeviceClass.MONETARY,
+        state_class=SensorStateClass.TOTAL,
+        period=None,
+    ),
+)
+
+
+@dataclass
+class GreenchoiceDiagnosticSensorEntityDescription(SensorEntityDescription):
+    """Describes a Greenchoice diagnostic sensor, read from the metrics of the coordinator or the client."""
+
+    value_fn: Callable[[GreenchoiceMetrics, GreenchoiceMetrics], StateType] = lambda update_metrics, api_metrics: None
+
+
+SENSORS_DIAGNOSTICS: tuple[GreenchoiceDiagnosticSensorEntityDescription, ...] = (
+    GreenchoiceDiagnosticSensorEntityDescription(
+        key=MeasurementNames.UPDATE_DURATION,
+        name="Duur laatste update",
+        icon="mdi:timer-outline",
+        native_unit_of_measurement=TIME_MILLISECONDS,
+        device_class=SensorDeviceClass.DURATION,
+        state_class=SensorStateClass.MEASUREMENT,
+        value_fn=lambda update_metrics, api_metrics: update_metrics.last("update"),
+    ),
+    GreenchoiceDiagnosticSensorEntityDescription(
+        key=MeasurementNames.UPDATE_DURATION_P90,
+        name="Duur update (p90)",
+        icon="mdi:timer-outline",
+        native_unit_of_measurement=TIME_MILLISECONDS,
+        device_class=SensorDeviceClass.DURATION,
+        state_class=SensorStateClass.MEASUREMENT,
+        value_fn=lambda update_metrics, api_metrics: update_metrics.percentile("update", 90),
+    ),
+    GreenchoiceDiagnosticSensorEntityDescription(
+        key=MeasurementNames.PARSE_DURATION,
+        name="Duur verwerking meterstanden",
+        icon="mdi:timer-cog-outline",
+        native_unit_of_measurement=TIME_MILLISECONDS,
+        device_class=SensorDeviceClass.DURATION,
+        state_class=SensorStateClass.MEASUREMENT,
+        value_fn=lambda update_metrics, api_metrics: api_metrics.last("parse_opnames"),
+    ),
+    GreenchoiceDiagnosticSensorEntityDescription(
+        key=MeasurementNames.LOGIN_COUNT,
+        name="Aantal logins",
+        icon="mdi:login",
+        state_class=SensorStateClass.TOTAL_INCREASING,
+        value_fn=lambda update_metrics, api_metrics: api_metrics.counters.get("logins", 0),
+    ),
+)
+
+
 async def async_setup_entry(
         hass: HomeAssistant, entry: ConfigEntry, async_add_entities: AddEntitiesCallback
 ) -> None:
@@ -188,7 +359,8 @@ async def async_setup_entry(
             service_key=service_key
         )
 
-    def __add_entities(sensor_list: tuple[SensorEntityDescription, ...], service_key: Literal["meterstand_stroom", "meterstand_gas", "tarieven"]):
+    def __add_entities(sensor_list: tuple[SensorEntityDescription, ...],
+                       service_key: Literal["meterstand_stroom", "meterstand_gas", "tarieven", "verbruik_stroom", "verbruik_gas", "kosten"]):
         async_add_entities(
             sensor_entity
             for description in sensor_list
@@ -199,15 +371,31 @@ async def async_setup_entry(
     has_gas = entry.data["has_gas"]
     if has_power and entry.options[CONF_METERSTAND_STROOM_ENABLED]:
         __add_entities(SENSORS_POWER, SERVICE_METERSTAND_STROOM)
+        __add_entities(SENSORS_CONSUMPTION_POWER, SERVICE_VERBRUIK_STROOM)
 
     if has_gas and entry.options[CONF_METERSTAND_GAS_ENABLED]:
         __add_entities(SENSORS_GAS, SERVICE_METERSTAND_GAS)
+        __add_entities(SENSORS_CONSUMPTION_GAS, SERVICE_VERBRUIK_GAS)
 
     if entry.options[CONF_TARIEVEN_ENABLED]:
         if has_power:
             __add_entities(SENSORS_TARIFFS_POWER, SERVICE_TARIEVEN)
         if has_gas:
             __add_entities(SENSORS_TARIFFS_GAS, SERVICE_TARIEVEN)
+        # the costs are computed from the meter history
+        if has_power and entry.options[CONF_METERSTAND_STROOM_ENABLED]:
+            __add_entities(SENSORS_COSTS_POWER, SERVICE_KOSTEN)
+        if has_gas and entry.options[CONF_METERSTAND_GAS_ENABLED]:
+            __add_entities(SENSORS_COSTS_GAS, SERVICE_KOSTEN)
+
+    async_add_entities(
+        GreenchoiceDiagnosticSensorEntity(
+            coordinator=hass.data[DOMAIN][entry.entry_id],
+            description=description,
+            name=f"{DOMAIN}_{entry.data['overeenkomst_id']}",
+        )
+        for description in SENSORS_DIAGNOSTICS
+    )
 
 
 class GreenchoiceSensorEntity(CoordinatorEntity, SensorEntity):
@@ -233,15 +421,98 @@ class GreenchoiceSensorEntity(CoordinatorEntity, SensorEntity):
             entry_type=DeviceEntryType.SERVICE,
         )
 
-    @property
-    def native_value(self) -> StateType | date | datetime | Decimal:
-        value = self.coordinator.data[self._service_key][self.entity_description.key]
-        if isinstance(value, str):
-            return value.lower()
-        return value
+        # bound once, so rendering the state only reads attributes
+        self._get_service_data = attrgetter(service_key)
+        self._get_value = attrgetter(description.key)
+        # consumption and cost sensors reset at the start of their period, the yearly costs at the start of the year
+        is_period_sensor = isinstance(description, GreenchoicePeriodSensorEntityDescription)
+        self._get_period_start = attrgetter(f"start_{description.period}") if is_period_sensor and description.period else None
+        self._yearly_reset = not is_period_sensor and description.state_class == SensorStateClass.TOTAL
+        self._measurement = (service_key, str(description.key))
+        self._period_start_measurement = (service_key, f"start_{description.period}") if self._get_period_start is not None else None
+        self.__update_values()
+
+    @callback
+    def _handle_coordinator_update(self) -> None:
+        changed_measurements = self.coordinator.changed_measurements
+        if (changed_measurements is not None and self._measurement not in changed_measurements
+                and not self.__new_period(changed_measurements) and not self.__new_year()):
+            # the value didn't change, writing the same state again would only load the recorder
+            return
+        self.__update_values()
+        super()._handle_coordinator_update()
+
+    def __new_period(self, changed_measurements: set[tuple[str, str]]) -> bool:
+        """Whether a period sensor starts a new period, which has to be written also when its value is the same."""
+        if self._period_start_measurement is None:
+            return False
+        # the start is compared as well, an update that skipped the sensor may have changed it before
+        return self._period_start_measurement in changed_measurements or self.__period_start() != self._attr_last_reset
+
+    def __new_year(self) -> bool:
+        return self._yearly_reset and self._attr_last_reset is not None and self._attr_last_reset.year != datetime.now().year
+
+    def __service_data(self):
+        data = self.coordinator.data
+        return None if data is None else self._get_service_data(data)
+
+    def __period_start(self) -> datetime | None:
+        service_data = self.__service_data()
+        period_start = None if service_data is None else self._get_period_start(service_data)
+        return None if period_start is None else period_start.replace(tzinfo=dt_util.DEFAULT_TIME_ZONE)
+
+    def __update_values(self) -> None:
+        """Take the value from the current data, once per update instead of on every state read."""
+        service_data = self.__service_data()
+        self._attr_native_value = None if service_data is None else self._get_value(service_data)
+        if self._get_period_start is not None:
+            self._attr_last_reset = self.__period_start()
+        elif self._yearly_reset:
+            self._attr_last_reset = datetime(datetime.now().year, 1, 1)
+
+
+class GreenchoiceDiagnosticSensorEntity(SensorEntity):
+    """Timing or counter of the integration itself, disabled by default."""
+
+    entity_description: GreenchoiceDiagnosticSensorEntityDescription
+    _attr_should_poll = False
+    _attr_entity_category = EntityCategory.DIAGNOSTIC
+    _attr_entity_registry_enabled_default = False
+
+    def __init__(self,
+                 *,
+                 coordinator: GreenchoiceDataUpdateCoordinator,
+                 description: GreenchoiceDiagnosticSensorEntityDescription,
+                 name: str):
+        """Initialize Greenchoice diagnostic sensor"""
+        self.coordinator = coordinator
+        overeenkomst_id = coordinator.config_entry.data['overeenkomst_id']
+        self.entity_id = f"{SENSOR_DOMAIN}.{name}.{description.key}"
+        self.entity_description = description
+        self._attr_unique_id = f"{coordinator.config_entry.entry_id}_{overeenkomst_id}_{SERVICE_DIAGNOSTIEK}_{description.key}"
+        self._attr_device_info = DeviceInfo(
+            identifiers={
+                (DOMAIN, f"{coordinator.config_entry.entry_id}_{overeenkomst_id}_{SERVICE_DIAGNOSTIEK}")
+            },
+            name=f"{SERVICES[SERVICE_DIAGNOSTIEK]} ({overeenkomst_id})",
+            manufacturer=MANUFACTURER,
+            entry_type=DeviceEntryType.SERVICE,
+        )
+
+    async def async_added_to_hass(self) -> None:
+        """Follow every refresh of the coordinator, also the ones that leave the data unchanged."""
+        self.async_on_remove(
+            async_dispatcher_connect(
+                self.hass,
+                SIGNAL_METRICS_UPDATED.format(self.coordinator.config_entry.entry_id),
+                self._handle_metrics_update,
+            )
+        )
+
+    @callback
+    def _handle_metrics_update(self) -> None:
+        self.async_write_ha_state()
 
     @property
-    def last_reset(self) -> datetime | None:
-        if self.state_class == SensorStateClass.TOTAL:
-            return datetime(datetime.now().year, 1, 1)
-        return None
+    def native_value(self) -> StateType:
+        return self.entity_description.value_fn(self.coordinator.metrics, self.coordinator.api.metrics)
@@ -0,0 +1,139 @@
+"""Import of the Greenchoice meter reading history into the Home Assistant long-term statistics."""
+from __future__ import annotations
+
+from datetime import datetime, timedelta
+from typing import Any, Dict, List
+
+from homeassistant.components.recorder.models import StatisticData, StatisticMetaData
+from homeassistant.components.recorder.statistics import async_add_external_statistics
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.const import CURRENCY_EURO, ENERGY_KILO_WATT_HOUR, VOLUME_CUBIC_METERS
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.storage import Store
+from homeassistant.util import dt as dt_util
+
+from .const import (
+    CONF_OVEREENKOMST_ID,
+    DOMAIN,
+    LOGGER,
+    STORAGE_KEY_STATISTICS,
+    STORAGE_VERSION,
+    MeasurementNames,
+    meter_increment,
+)
+from .greenchoice_api import GreenchoiceApiData, GreenchoiceMeterReading
+
+STATISTICS: Dict[MeasurementNames, tuple[str, str]] = {
+    MeasurementNames.ENERGY_HIGH_IN: ("Energie levering hoog tarief", ENERGY_KILO_WATT_HOUR),
+    MeasurementNames.ENERGY_LOW_IN: ("Energie levering laag tarief", ENERGY_KILO_WATT_HOUR),
+    MeasurementNames.ENERGY_HIGH_OUT: ("Energie teruglevering hoog tarief", ENERGY_KILO_WATT_HOUR),
+    MeasurementNames.ENERGY_LOW_OUT: ("Energie teruglevering laag tarief", ENERGY_KILO_WATT_HOUR),
+    MeasurementNames.GAS_IN: ("Gas consumptie", VOLUME_CUBIC_METERS),
+}
+
+
+def statistic_id(overeenkomst_id: int | str, key: str) -> str:
+    """Return the external statistic id for a measurement of a contract."""
+    return f"{DOMAIN}:{overeenkomst_id}_{key}"
+
+
+def statistic_start(datum: datetime) -> datetime:
+    """Return the start of the statistic period of a reading, the last hour of the day the reading completes.
+
+    A reading is the meter state at the start of its day, like in the consumption and cost sensors, and the sum of a
+    statistic is the value at the end of its hour, so the reading of day D closes the last hour of day D-1.
+    """
+    # readings are reported in local time, statistics have to start at a whole hour
+    start = (datum - timedelta(hours=1)).replace(minute=0, second=0, microsecond=0, tzinfo=dt_util.DEFAULT_TIME_ZONE)
+    return dt_util.as_utc(start)
+
+
+@callback
+def async_add_cost_statistics(hass: HomeAssistant, overeenkomst_id: int | str, key: str, name: str, costs: List[tuple[datetime, float]]) -> None:
+    """Add running cost totals, as (reading date, total) pairs, to the external statistics of a contract."""
+    stat_id = statistic_id(overeenkomst_id, key)
+    metadata = StatisticMetaData(
+        has_mean=False,
+        has_sum=True,
+        name=f"Greenchoice {name} ({overeenkomst_id})",
+        source=DOMAIN,
+        statistic_id=stat_id,
+        unit_of_measurement=CURRENCY_EURO,
+    )
+    LOGGER.debug(f"Importing {len(costs)} cost totals into {stat_id}")
+    async_add_external_statistics(hass, metadata, [StatisticData(start=statistic_start(datum), state=total, sum=total) for datum, total in costs])
+
+
+def statistics_store(hass: HomeAssistant, entry_id: str) -> Store:
+    """Return the store with the import progress of a config entry."""
+    return Store(hass, STORAGE_VERSION, f"{STORAGE_KEY_STATISTICS}.{entry_id}")
+
+
+class GreenchoiceStatisticsImporter:
+    """Incrementally imports the meter history of a contract as external statistics.
+
+    The first import backfills the complete history Greenchoice returns, after that only readings newer than the
+    last imported opnameDatum are added. The progress is persisted so a restart doesn't trigger a new backfill.
+    """
+
+    def __init__(self, hass: HomeAssistant, entry: ConfigEntry) -> None:
+        """Initialize the importer."""
+        self.hass = hass
+        self._overeenkomst_id = entry.data[CONF_OVEREENKOMST_ID]
+        self._store = statistics_store(hass, entry.entry_id)
+        self._progress: Dict[str, Dict[str, Any]] | None = None
+
+    async def async_import(self, data: GreenchoiceApiData) -> None:
+        """Import the readings that weren't imported yet."""
+        if self._progress is None:
+            self._progress = await self._store.async_load() or {}
+
+        changed = False
+        for historie in (data.historie_stroom, data.historie_gas):
+            if historie:
+                for key in STATISTICS:
+                    changed |= self.__import_measurement(historie, key)
+
+        if changed:
+            await self._store.async_save(self._progress)
+
+    def __import_measurement(self, historie: List[GreenchoiceMeterReading], key: MeasurementNames) -> bool:
+        stat_id = statistic_id(self._overeenkomst_id, key)
+        progress = self._progress.get(stat_id)
+        last_start = dt_util.parse_datetime(progress["last_start"]) if progress else None
+        last_state: float | None = progress["last_state"] if progress else None
+        total: float = progress["sum"] if progress else 0.0
+
+        statistics: List[StatisticData] = []
+        for reading in historie:
+            state = reading.waarden.get(key)
+            if state is None:
+                continue
+
+            start = statistic_start(reading.datum)
+            if last_start is not None and start <= last_start:
+                continue
+
+            if last_state is not None:
+                total += meter_increment(last_state, state)
+            statistics.append(StatisticData(start=start, state=state, sum=total))
+            last_start = start
+            last_state = state
+
+        if not statistics:
+            return False
+
+        name, unit = STATISTICS[key]
+        metadata = StatisticMetaData(
+            has_mean=False,
+            has_sum=True,
+            name=f"Greenchoice {name} ({self._overeenkomst_id})",
+            source=DOMAIN,
+            statistic_id=stat_id,
+            unit_of_measurement=unit,
+        )
+        LOGGER.debug(f"Importing {len(statistics)} readings into {stat_id}")
+        async_add_external_statistics(self.hass, metadata, statistics)
+
+        self._progress[stat_id] = {"last_start": last_start.isoformat(), "last_state": last_state, "sum": total}
+        return True
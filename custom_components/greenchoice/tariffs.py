@@ -0,0 +1,104 @@
+"""History of the tariffs of a Greenchoice contract."""
+from __future__ import annotations
+
+from bisect import bisect_right
+from dataclasses import fields
+from datetime import datetime
+from typing import Any, Dict, List
+
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers.storage import Store
+from homeassistant.util import dt as dt_util
+
+from .const import (
+    EVENT_TARIFF_CHANGED,
+    LOGGER,
+    STORAGE_KEY_TARIFFS,
+    STORAGE_VERSION,
+)
+from .greenchoice_api import GreenchoiceTarieven, measurement_as_dict, measurement_from_dict
+
+
+def tariffs_store(hass: HomeAssistant, overeenkomst_id: int | str) -> Store:
+    """Return the store with the tariff history of a contract."""
+    return Store(hass, STORAGE_VERSION, f"{STORAGE_KEY_TARIFFS}.{overeenkomst_id}")
+
+
+def tariff_prices(tarieven: GreenchoiceTarieven) -> GreenchoiceTarieven:
+    """Return only the prices of the tariffs, without the yearly cost estimate that comes with them."""
+    return GreenchoiceTarieven(**{
+        field.name: getattr(tarieven, field.name) for field in fields(tarieven) if field.name.startswith("tarief_")
+    })
+
+
+def prices_as_dict(tarieven: GreenchoiceTarieven) -> Dict[str, float | None]:
+    """Return the prices of the tariffs in a JSON compatible form."""
+    return {key: value for key, value in measurement_as_dict(tarieven).items() if key.startswith("tarief_")}
+
+
+class GreenchoiceTariffHistory:
+    """Versions of the tariffs of a contract, each valid from the day it was first seen.
+
+    A version only holds the prices, and is only added when they differ from the latest version, after which an
+    EVENT_TARIFF_CHANGED event is fired. The versions are kept in order, so the tariffs at a moment are found with a
+    binary search. Moments before the first version get the first version, those are the oldest tariffs known.
+    """
+
+    def __init__(self, hass: HomeAssistant, overeenkomst_id: int | str) -> None:
+        """Initialize the tariff history."""
+        self.hass = hass
+        self._overeenkomst_id = overeenkomst_id
+        self._store = tariffs_store(hass, overeenkomst_id)
+        self._valid_from: List[datetime] | None = None
+        self._versions: List[GreenchoiceTarieven] = []
+
+    async def async_load(self) -> None:
+        """Load the stored versions, once."""
+        if self._valid_from is not None:
+            return
+        stored = await self._store.async_load() or {"versions": []}
+        self._valid_from = [datetime.fromisoformat(version["valid_from"]) for version in stored["versions"]]
+        self._versions = [tariff_prices(measurement_from_dict(GreenchoiceTarieven, version["tarieven"])) for version in stored["versions"]]
+
+    async def async_record(self, tarieven: GreenchoiceTarieven) -> bool:
+        """Add the prices of the tariffs as a new version when they changed, returns whether they did."""
+        await self.async_load()
+        # the yearly cost estimate changes with the consumption, it doesn't make a new version
+        tarieven = tariff_prices(tarieven)
+        previous = self._versions[-1] if self._versions else None
+        if tarieven == previous:
+            return False
+
+        # local start of the day like the readings, it is unknown when during the day the tariffs changed
+        valid_from = dt_util.start_of_local_day().replace(tzinfo=None)
+        if self._valid_from and self._valid_from[-1] == valid_from:
+            # changed again on the same day, the earlier version of today never applied to a whole day
+            self._valid_from.pop()
+            self._versions.pop()
+        self._valid_from.append(valid_from)
+        self._versions.append(tarieven)
+        await self._store.async_save(self.__as_dict())
+
+        if previous is not None:
+            LOGGER.info(f"Tariffs of overeenkomst {self._overeenkomst_id} changed")
+            self.hass.bus.async_fire(EVENT_TARIFF_CHANGED, {
+                "overeenkomst_id": self._overeenkomst_id,
+                "valid_from": valid_from.isoformat(),
+                "previous": prices_as_dict(previous),
+                "tarieven": prices_as_dict(tarieven),
+            })
+        return True
+
+    def at(self, moment: datetime) -> GreenchoiceTarieven | None:
+        """Return the tariffs in force at a local moment, None when there are no tariffs at all."""
+        if not self._versions:
+            return None
+        return self._versions[max(0, bisect_right(self._valid_from, moment) - 1)]
+
+    def __as_dict(self) -> Dict[str, Any]:
+        return {
+            "versions": [
+                {"valid_from": valid_from.isoformat(), "tarieven": prices_as_dict(tarieven)}
+                for valid_from, tarieven in zip(self._valid_from, self._versions)
+            ]
+        }
@@ -0,0 +1,61 @@
+"""Fixtures shared by the tests."""
+import contextlib
+from typing import AsyncIterator, Callable
+
+import aiohttp
+import pytest
+
+from benchmarks.stub_server import PASSWORD, USERNAME, StubServer, start
+from custom_components.greenchoice.greenchoice_api import GreenchoiceAsyncApi
+
+
+class MemoryStore:
+    """Keeps the saved state in memory instead of in the storage of Home Assistant."""
+
+    def __init__(self):
+        self.data = None
+
+    async def async_load(self):
+        return self.data
+
+    async def async_save(self, data):
+        self.data = data
+
+    async def async_remove(self):
+        self.data = None
+
+
+@pytest.fixture
+def memory_stores(monkeypatch) -> Callable[[object, str], list[MemoryStore]]:
+    """Replace a store factory of a module by one that creates a MemoryStore, returns the list of the stores created."""
+    def patch(module, factory: str) -> list[MemoryStore]:
+        stores = []
+
+        def create(*args):
+            stores.append(MemoryStore())
+            return stores[-1]
+
+        monkeypatch.setattr(module, factory, create)
+        return stores
+
+    return patch
+
+
+@contextlib.asynccontextmanager
+async def _stub_api(password: str = PASSWORD, months: int = 2, latency_ms: float = 0) -> AsyncIterator[tuple[StubServer, GreenchoiceAsyncApi]]:
+    server = StubServer(months, latency_ms)
+    runner, base_url = await start(server)
+    session = aiohttp.ClientSession()
+    api = GreenchoiceAsyncApi(session, USERNAME, password, base_url)
+    try:
+        yield server, api
+    finally:
+        await api.async_close()
+        await session.close()
+        await runner.cleanup()
+
+
+@pytest.fixture
+def stub_api() -> Callable[..., contextlib.AbstractAsyncContextManager]:
+    """Start the local Greenchoice stand-in, an async context manager that yields the server and a client for it."""
+    return _stub_api
@@ -0,0 +1,111 @@
+"""Tests of the coalescing of identical requests by GreenchoiceAsyncApi."""
+import asyncio
+
+import pytest
+
+from custom_components.greenchoice.greenchoice_api import GreenchoiceAuthError
+
+TARIEVEN_REQUEST = ("POST", "/microbus/request", {"name": "GetTariefOvereenkomst", "message": {"overeenkomstId": 1234567}})
+
+
+def request(api, method: str, endpoint: str, data=None):
+    # the request method is private to the client, like the benchmarks the tests call it directly
+    return api._GreenchoiceAsyncApi__async_request(method, endpoint, data)
+
+
+def test_concurrent_callers_share_a_request(stub_api):
+    async def run():
+        async with stub_api(latency_ms=20) as (server, api):
+            bodies = await asyncio.gather(*(request(api, *TARIEVEN_REQUEST) for _ in range(3)))
+
+            assert bodies[0] is not None and bodies.count(bodies[0]) == 3
+            assert server.requests["GetTariefOvereenkomst"] == 1
+            assert server.requests["/signin-oidc"] == 1
+            assert api.metrics.counters["requests_coalesced"] == 2
+
+    asyncio.run(run())
+
+
+def test_recent_response_shared(stub_api):
+    async def run():
+        async with stub_api() as (server, api):
+            first = await request(api, *TARIEVEN_REQUEST)
+            assert await request(api, *TARIEVEN_REQUEST) is first
+            assert server.requests["GetTariefOvereenkomst"] == 1
+
+            api.coalesce_seconds = 0
+            await request(api, *TARIEVEN_REQUEST)
+            assert server.requests["GetTariefOvereenkomst"] == 2
+
+    asyncio.run(run())
+
+
+def test_cancelled_caller_keeps_the_request(stub_api):
+    async def run():
+        async with stub_api(latency_ms=20) as (server, api):
+            cancelled = asyncio.ensure_future(request(api, *TARIEVEN_REQUEST))
+            waiting = asyncio.ensure_future(request(api, *TARIEVEN_REQUEST))
+            await asyncio.sleep(0.03)
+            cancelled.cancel()
+
+            assert await waiting is not None
+            with pytest.raises(asyncio.CancelledError):
+                await cancelled
+            assert server.requests["GetTariefOvereenkomst"] == 1
+
+    asyncio.run(run())
+
+
+def test_missing_response_not_shared(stub_api):
+    async def run():
+        async with stub_api() as (server, api):
+            # the stand-in answers unknown requests with a 404, the client returns None for it
+            assert await request(api, "POST", "/microbus/request", {"name": "Onbekend"}) is None
+            assert await request(api, "POST", "/microbus/request", {"name": "Onbekend"}) is None
+
+            assert server.requests["Onbekend"] == 2
+
+    asyncio.run(run())
+
+
+def test_failed_request_not_shared(stub_api):
+    async def run():
+        async with stub_api(password="wrong") as (server, api):
+            for _ in range(2):
+                with pytest.raises(GreenchoiceAuthError):
+                    await request(api, *TARIEVEN_REQUEST)
+
+            assert server.requests["/Account/Login"] == 4
+            assert not api._recent_responses
+
+    asyncio.run(run())
+
+
+def test_invalidate_cache_drops_recent_responses(stub_api):
+    async def run():
+        async with stub_api() as (server, api):
+            await api.async_get_overeenkomsten()
+            api.invalidate_cache()
+            await api.async_get_overeenkomsten()
+
+            assert server.requests["/microbus/init"] == 2
+
+    asyncio.run(run())
+
+
+def test_close_cancels_requests_in_flight(stub_api):
+    async def run():
+        async with stub_api(latency_ms=50) as (server, api):
+            caller = asyncio.ensure_future(request(api, *TARIEVEN_REQUEST))
+            await asyncio.sleep(0.01)
+            in_flight = list(api._requests_in_flight.values())
+            assert len(in_flight) == 1
+
+            await api.async_close()
+
+            assert in_flight[0].cancelled()
+            with pytest.raises(asyncio.CancelledError):
+                await caller
+            assert not api._requests_in_flight
+
+    asyncio.run(run())
@@ -0,0 +1,85 @@
+"""Tests of the export and import of the session cookies of GreenchoiceAsyncApi."""
+import asyncio
+from http.cookies import SimpleCookie
+
+import aiohttp
+from yarl import URL
+
+from benchmarks.stub_server import AUTH_COOKIE, PASSWORD, USERNAME
+from custom_components.greenchoice.greenchoice_api import GreenchoiceAsyncApi
+
+GREENCHOICE_URL = "https://mijn.greenchoice.nl"
+
+
+def test_domain_and_host_only_cookies():
+    async def run():
+        async with aiohttp.ClientSession() as session, aiohttp.ClientSession() as restored_session:
+            api = GreenchoiceAsyncApi(session, USERNAME, PASSWORD, GREENCHOICE_URL)
+            cookies = SimpleCookie()
+            cookies["domain_cookie"] = "1"
+            cookies["domain_cookie"]["domain"] = ".greenchoice.nl"
+            cookies["domain_cookie"]["path"] = "/"
+            cookies["domain_cookie"]["secure"] = True
+            cookies["host_cookie"] = "2"
+            session.cookie_jar.update_cookies(cookies, URL(GREENCHOICE_URL))
+            api.logged_in = True
+
+            exported = sorted(api.export_cookies(), key=lambda cookie: cookie["key"])
+            assert exported == [
+                {"key": "domain_cookie", "value": "1", "domain": "greenchoice.nl", "path": "/", "secure": True},
+                {"key": "host_cookie", "value": "2", "domain": "mijn.greenchoice.nl", "path": "/"},
+            ]
+
+            restored = GreenchoiceAsyncApi(restored_session, USERNAME, PASSWORD, GREENCHOICE_URL)
+            restored.import_cookies(exported)
+
+            assert restored.logged_in
+            sent = restored_session.cookie_jar.filter_cookies(URL(GREENCHOICE_URL + "/microbus/init"))
+            assert {key: morsel.value for key, morsel in sent.items()} == {"domain_cookie": "1", "host_cookie": "2"}
+            assert sorted(restored.export_cookies(), key=lambda cookie: cookie["key"]) == exported
+
+    asyncio.run(run())
+
+
+def test_not_logged_in_exports_nothing():
+    async def run():
+        async with aiohttp.ClientSession() as session:
+            api = GreenchoiceAsyncApi(session, USERNAME, PASSWORD, GREENCHOICE_URL)
+            assert api.export_cookies() == []
+
+            api.import_cookies([])
+            assert not api.logged_in
+
+    asyncio.run(run())
+
+
+def test_restored_session_skips_login(stub_api):
+    async def run():
+        async with stub_api() as (server, api):
+            await api.async_get_overeenkomsten()
+            exported = api.export_cookies()
+
+            async with aiohttp.ClientSession() as session:
+                restored = GreenchoiceAsyncApi(session, USERNAME, PASSWORD, api.base_url)
+                restored.import_cookies(exported)
+                await restored.async_get_overeenkomsten()
+
+            assert server.requests["/signin-oidc"] == 1
+            assert server.requests["/microbus/init"] == 2
+
+    asyncio.run(run())
+
+
+def test_stale_session_logs_in(stub_api):
+    async def run():
+        async with stub_api() as (server, api):
+            api.import_cookies([{"key": AUTH_COOKIE, "value": "expired", "domain": "localhost", "path": "/"}])
+            assert api.logged_in
+
+            overeenkomsten = await api.async_get_overeenkomsten()
+
+            assert [overeenkomst.overeenkomst_id for overeenkomst in overeenkomsten] == [1234567]
+            assert api.metrics.counters["session_expired"] == 1
+            assert server.requests["/signin-oidc"] == 1
+
+    asyncio.run(run())
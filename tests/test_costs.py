@@ -0,0 +1,131 @@
+"""Tests of the pricing of the meter history by GreenchoiceCostCalculator."""
+import asyncio
+from datetime import datetime
+from types import SimpleNamespace
+
+import pytest
+
+from custom_components.greenchoice import costs
+from custom_components.greenchoice.const import MeasurementNames
+from custom_components.greenchoice.costs import GreenchoiceCostCalculator, gas_prices, reading_day, stroom_prices
+from custom_components.greenchoice.greenchoice_api import GreenchoiceApiData, GreenchoiceMeterReading, GreenchoiceTarieven
+
+TARIEVEN = GreenchoiceTarieven(tarief_stroom_hoog_in=0.5, tarief_stroom_laag_in=0.25, tarief_stroom_terugleververgoeding=0.1, tarief_gas_in=2.0)
+
+
+def reading(datum: str, **waarden: float) -> GreenchoiceMeterReading:
+    return GreenchoiceMeterReading(datetime.fromisoformat(datum), {MeasurementNames(name): value for name, value in waarden.items()})
+
+
+@pytest.fixture
+def statistics(monkeypatch, memory_stores) -> list:
+    """The cost totals added to the statistics, per call."""
+    added = []
+    memory_stores(costs, "costs_store")
+    monkeypatch.setattr(costs, "async_add_cost_statistics", lambda hass, overeenkomst_id, key, name, totals: added.append((key, totals)))
+    return added
+
+
+def calculator(tarieven: GreenchoiceTarieven | None) -> GreenchoiceCostCalculator:
+    entry = SimpleNamespace(entry_id="test", data={"overeenkomst_id": 1})
+    return GreenchoiceCostCalculator(None, entry, SimpleNamespace(at=lambda moment: tarieven))
+
+
+def update(calculator: GreenchoiceCostCalculator, historie_stroom=None, historie_gas=None):
+    return asyncio.run(calculator.async_update(GreenchoiceApiData(None, None, None, historie_stroom=historie_stroom, historie_gas=historie_gas)))
+
+
+def test_stroom_prices():
+    assert stroom_prices(TARIEVEN) == {
+        MeasurementNames.ENERGY_HIGH_IN: 0.5,
+        MeasurementNames.ENERGY_LOW_IN: 0.25,
+        MeasurementNames.ENERGY_HIGH_OUT: -0.1,
+        MeasurementNames.ENERGY_LOW_OUT: -0.1,
+    }
+
+
+def test_stroom_prices_without_terugleververgoeding():
+    tarieven = GreenchoiceTarieven(tarief_stroom_hoog_in=0.5, tarief_stroom_laag_in=0.25)
+
+    assert stroom_prices(tarieven) == {MeasurementNames.ENERGY_HIGH_IN: 0.5, MeasurementNames.ENERGY_LOW_IN: 0.25}
+
+
+@pytest.mark.parametrize("tarieven", [
+    GreenchoiceTarieven(tarief_stroom_laag_in=0.25, tarief_stroom_terugleververgoeding=0.1),
+    GreenchoiceTarieven(tarief_stroom_hoog_in=0.5, tarief_stroom_terugleververgoeding=0.1),
+])
+def test_stroom_prices_without_consumption_tariff(tarieven):
+    assert stroom_prices(tarieven) is None
+
+
+def test_gas_prices():
+    assert gas_prices(TARIEVEN) == {MeasurementNames.GAS_IN: 2.0}
+    assert gas_prices(GreenchoiceTarieven()) is None
+
+
+def test_reading_day():
+    # a reading is the meter state at the start of its day, it completes the day before
+    assert reading_day(datetime(2024, 6, 1)) == datetime(2024, 5, 31).date()
+
+
+def test_day_month_and_total(statistics):
+    historie = [
+        reading("2024-04-30", stroom_hoog_in=100, stroom_laag_in=50, stroom_hoog_uit=10, stroom_laag_uit=0),
+        reading("2024-05-01", stroom_hoog_in=104, stroom_laag_in=50, stroom_hoog_uit=10, stroom_laag_uit=0),
+        reading("2024-05-02", stroom_hoog_in=106, stroom_laag_in=54, stroom_hoog_uit=20, stroom_laag_uit=0),
+        reading("2024-05-03", stroom_hoog_in=110, stroom_laag_in=54, stroom_hoog_uit=20, stroom_laag_uit=0),
+    ]
+    kosten = update(calculator(TARIEVEN), historie_stroom=historie)
+
+    # the first run starts at the month of the latest reading: the reading of May 1st is the baseline, so May 1st and
+    # 2nd are priced and April 30th, completed by that reading, is not
+    assert kosten.kosten_stroom_dag == 2.0
+    assert kosten.kosten_stroom_maand == 3.0
+    assert kosten.kosten_stroom_totaal == kosten.kosten_stroom_maand
+    assert kosten.start_dag == datetime(2024, 5, 2)
+    assert kosten.start_maand == datetime(2024, 5, 1)
+    assert statistics == [("kosten_stroom", [(datetime(2024, 5, 2), 1.0), (datetime(2024, 5, 3), 3.0)])]
+
+
+def test_return_without_terugleververgoeding(statistics):
+    historie = [
+        reading("2024-05-01", stroom_hoog_in=100, stroom_laag_in=50, stroom_hoog_uit=10),
+        reading("2024-05-02", stroom_hoog_in=104, stroom_laag_in=50, stroom_hoog_uit=30),
+    ]
+    tarieven = GreenchoiceTarieven(tarief_stroom_hoog_in=0.5, tarief_stroom_laag_in=0.25)
+
+    kosten = update(calculator(tarieven), historie_stroom=historie)
+
+    assert kosten.kosten_stroom_dag == 2.0
+    assert kosten.kosten_stroom_totaal == 2.0
+
+
+def test_readings_priced_once(statistics):
+    historie = [reading("2024-05-01", gas_in=100), reading("2024-05-02", gas_in=101.5)]
+    gas = calculator(TARIEVEN)
+
+    assert update(gas, historie_gas=historie).kosten_gas_totaal == 3.0
+    assert update(gas, historie_gas=historie).kosten_gas_totaal == 3.0
+    kosten = update(gas, historie_gas=[*historie, reading("2024-05-03", gas_in=102)])
+
+    assert kosten.kosten_gas_dag == 1.0
+    assert kosten.kosten_gas_totaal == 4.0
+    assert [key for key, _ in statistics] == ["kosten_gas", "kosten_gas"]
+
+
+def test_meter_replaced(statistics):
+    historie = [reading("2024-05-01", gas_in=2000), reading("2024-05-02", gas_in=3)]
+
+    # all of the reading of the new meter was consumed after the replacement
+    assert update(calculator(TARIEVEN), historie_gas=historie).kosten_gas_dag == 6.0
+
+
+def test_without_tariffs(statistics):
+    historie = [reading("2024-05-01", gas_in=100), reading("2024-05-02", gas_in=101)]
+    gas = calculator(None)
+
+    assert update(gas, historie_gas=historie).kosten_gas_totaal == 0.0
+    assert statistics == []
+    # the readings are priced once the tariffs are known
+    gas._tariffs = SimpleNamespace(at=lambda moment: TARIEVEN)
+    assert update(gas, historie_gas=historie).kosten_gas_totaal == 2.0
@@ -0,0 +1,172 @@
+"""Tests of the incremental decoding of OpnamesOphalen responses by GreenchoiceOpnamesParser."""
+import json
+from datetime import datetime
+
+import pytest
+
+from custom_components.greenchoice.const import TELWERK_MEASUREMENTS
+from custom_components.greenchoice.greenchoice_api import GreenchoiceOpnamesParser
+
+
+def opname(datum: str, *standen: tuple[int, float]) -> dict:
+    return {
+        "opnameDatum": f"{datum}T00:00:00",
+        "opnameType": "Dagstand",
+        "standen": [{"telwerk": telwerk, "waarde": waarde, "eenheid": "kWh"} for telwerk, waarde in standen],
+    }
+
+
+DOCUMENT = {
+    "model": {
+        "heeftStroom": True,
+        "heeftGas": True,
+        # multibyte characters, split over the chunks by the small chunk sizes
+        "omschrijving": "Meterstanden één € ✓",
+        "productenOpnamesModel": [
+            {
+                "productType": "Stroom",
+                "opnamesJaarMaandModel": [
+                    {"jaar": 2024, "maand": 4, "opnames": []},
+                    {"jaar": 2024, "maand": 5, "opnames": [opname("2024-05-30", (1, 1000.5), (2, 800.25)),
+                                                           opname("2024-05-31", (1, 1004.125), (2, 803), (6, 1))]},
+                    {"jaar": 2024, "maand": 6, "opnames": None},
+                    {"jaar": 2024, "maand": 7, "opnames": [opname("2024-07-01", (1, 1010), (2, 810), (3, 12.5), (4, 7))]},
+                ],
+            },
+            {
+                "productType": "Gas",
+                "opnamesJaarMaandModel": [
+                    {"jaar": 2024, "maand": 6, "opnames": [opname("2024-06-01", (5, 500.75))]},
+                ],
+            },
+        ],
+    }
+}
+
+
+def expected_historie(document: dict) -> list[list[tuple[datetime, dict]]]:
+    """The readings per product, decoded from the whole document."""
+    return [
+        [
+            (datetime.fromisoformat(reading["opnameDatum"]),
+             {TELWERK_MEASUREMENTS[stand["telwerk"]]: stand["waarde"] for stand in reading["standen"] if stand["telwerk"] in TELWERK_MEASUREMENTS})
+            for month in product["opnamesJaarMaandModel"] or [] for reading in month["opnames"] or []
+        ]
+        for product in (document["model"] or {}).get("productenOpnamesModel") or []
+    ]
+
+
+def decode(body: bytes, chunk_size: int) -> GreenchoiceOpnamesParser:
+    parser = GreenchoiceOpnamesParser()
+    for offset in range(0, len(body), chunk_size):
+        parser.feed(body[offset:offset + chunk_size])
+    return parser.close()
+
+
+def historie(parser: GreenchoiceOpnamesParser) -> list[list[tuple[datetime, dict]]]:
+    return [[(reading.datum, reading.waarden) for reading in product] for product in parser.historie]
+
+
+@pytest.mark.parametrize("chunk_size", [1, 7, 100, 1 << 20])
+@pytest.mark.parametrize("indent", [None, 2])
+def test_chunk_boundaries(chunk_size, indent):
+    body = json.dumps(DOCUMENT, indent=indent, ensure_ascii=False).encode()
+    parser = decode(body, chunk_size)
+
+    assert parser.heeft_stroom and parser.heeft_gas
+    assert historie(parser) == expected_historie(DOCUMENT)
+    assert [newest.datum for newest in parser.newest] == [datetime(2024, 7, 1), datetime(2024, 6, 1)]
+    assert parser.in_order == [True, True]
+
+
+def test_out_of_order():
+    document = json.loads(json.dumps(DOCUMENT))
+    document["model"]["productenOpnamesModel"][0]["opnamesJaarMaandModel"].reverse()
+    parser = decode(json.dumps(document).encode(), 7)
+
+    assert parser.newest[0].datum == datetime(2024, 7, 1)
+    assert parser.in_order == [False, True]
+
+
+@pytest.mark.parametrize("document", [
+    {"model": {"heeftStroom": False, "heeftGas": False, "productenOpnamesModel": None}},
+    {"model": {"heeftStroom": True, "heeftGas": False, "productenOpnamesModel": [{"productType": "Stroom", "opnamesJaarMaandModel": None}]}},
+    {"model": {"heeftStroom": True, "heeftGas": False, "productenOpnamesModel": []}},
+    {"model": None},
+])
+def test_null_and_empty_containers(document):
+    parser = decode(json.dumps(document).encode(), 3)
+
+    assert parser.heeft_stroom == bool((document["model"] or {}).get("heeftStroom"))
+    assert historie(parser) == expected_historie(document)
+    assert all(newest is None for newest in parser.newest)
+
+
+def test_trailing_whitespace():
+    parser = decode(json.dumps(DOCUMENT).encode() + b" \r\n\t ", 5)
+
+    assert historie(parser) == expected_historie(DOCUMENT)
+
+
+@pytest.mark.parametrize("trailing", [b"x", b"{}", b" 1", b"\n]"])
+def test_trailing_data(trailing):
+    with pytest.raises(json.JSONDecodeError):
+        decode(json.dumps(DOCUMENT).encode() + trailing, 5)
+
+
+@pytest.mark.parametrize("length", [0, 1, 10, 100, -20, -1])
+def test_truncated(length):
+    body = json.dumps(DOCUMENT, ensure_ascii=False).encode()
+
+    with pytest.raises(json.JSONDecodeError):
+        decode(body[:length], 7)
+
+
+def test_truncated_within_multibyte_character():
+    body = json.dumps(DOCUMENT, ensure_ascii=False).encode()
+    end = body.index("€".encode()) + 1
+
+    with pytest.raises(json.JSONDecodeError):
+        decode(body[:end], 4)
+
+
+def test_invalid_utf8():
+    body = json.dumps(DOCUMENT, ensure_ascii=False).encode().replace("€".encode(), b"\xff")
+
+    with pytest.raises(json.JSONDecodeError):
+        decode(body, 7)
+
+
+def test_numbers_outside_opnames():
+    # floats and exponents in model and in the months are decoded as bare values, not as part of a whole opname
+    document = {
+        "model": {
+            "heeftStroom": True,
+            "heeftGas": False,
+            "versie": 1234.5,
+            "factor": 1e3,
+            "productenOpnamesModel": [
+                {
+                    "productType": "Stroom",
+                    "verbruik": -12.5E-2,
+                    "opnamesJaarMaandModel": [
+                        {"jaar": 2024, "maand": 5, "verbruik": 12.5, "opnames": [opname("2024-05-31", (1, 1004.125))]},
+                        {"jaar": 2024, "maand": 6, "verbruik": 3.25e+1, "opnames": []},
+                    ],
+                },
+            ],
+            "totaal": 0.5,
+        }
+    }
+    body = json.dumps(document).encode()
+
+    for chunk_size in [*range(1, 9), 64]:
+        for offset in range(chunk_size):
+            parser = GreenchoiceOpnamesParser()
+            parser.feed(body[:offset])
+            for start in range(offset, len(body), chunk_size):
+                parser.feed(body[start:start + chunk_size])
+            parser.close()
+
+            assert parser.heeft_stroom
+            assert historie(parser) == expected_historie(document)
@@ -0,0 +1,161 @@
+"""Tests of the retry backoff, the circuit breaker and how the API client uses them."""
+import asyncio
+import time
+
+import pytest
+
+from custom_components.greenchoice import retry
+from custom_components.greenchoice.greenchoice_api import GreenchoiceAuthError, GreenchoiceError
+from custom_components.greenchoice.retry import GreenchoiceCircuitBreaker, GreenchoiceRequestLimiter, backoff_delay
+
+
+@pytest.fixture
+def clock(monkeypatch) -> list[float]:
+    """The monotonic time seen by the circuit breaker, advanced by changing its only element."""
+    now = [1000.0]
+    monkeypatch.setattr(retry.time, "monotonic", lambda: now[0])
+    return now
+
+
+def test_backoff_bounds(monkeypatch):
+    for attempt in range(1, 10):
+        assert all(0 <= backoff_delay(attempt, base=2, cap=30) <= min(30, 2 ** attempt) for _ in range(100))
+
+    # full jitter draws up to the exponential delay, which is capped
+    monkeypatch.setattr(retry.random, "uniform", lambda low, high: high)
+    assert [backoff_delay(attempt, base=2, cap=30) for attempt in range(1, 7)] == [2, 4, 8, 16, 30, 30]
+
+
+def test_breaker_opens_after_threshold(clock):
+    breaker = GreenchoiceCircuitBreaker(failure_threshold=3, reset_timeout=60)
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == GreenchoiceCircuitBreaker.CLOSED and breaker.allow_request()
+
+    breaker.record_failure()
+    assert breaker.state == GreenchoiceCircuitBreaker.OPEN
+    assert not breaker.allow_request()
+    assert breaker.remaining == 60
+
+
+def test_success_resets_the_failures(clock):
+    breaker = GreenchoiceCircuitBreaker(failure_threshold=2, reset_timeout=60)
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+
+    assert breaker.state == GreenchoiceCircuitBreaker.CLOSED
+
+
+def test_half_open_lets_a_single_trial_through(clock):
+    breaker = GreenchoiceCircuitBreaker(failure_threshold=1, reset_timeout=60)
+    breaker.record_failure()
+    clock[0] += 60
+
+    assert breaker.state == GreenchoiceCircuitBreaker.HALF_OPEN
+    assert breaker.allow_request()
+    assert not breaker.allow_request()
+
+    breaker.record_success()
+    assert breaker.state == GreenchoiceCircuitBreaker.CLOSED and breaker.allow_request()
+
+
+def test_failed_trial_opens_again(clock):
+    breaker = GreenchoiceCircuitBreaker(failure_threshold=1, reset_timeout=60)
+    breaker.record_failure()
+    clock[0] += 60
+    assert breaker.allow_request()
+
+    breaker.record_failure()
+    assert breaker.state == GreenchoiceCircuitBreaker.OPEN and breaker.remaining == 60
+
+
+def test_released_trial(clock):
+    breaker = GreenchoiceCircuitBreaker(failure_threshold=1, reset_timeout=60)
+    breaker.record_failure()
+    clock[0] += 60
+    assert breaker.allow_request()
+
+    # a trial without an outcome leaves the breaker half open, the next request becomes the trial
+    breaker.release_trial()
+    assert breaker.state == GreenchoiceCircuitBreaker.HALF_OPEN
+    assert breaker.allow_request()
+
+
+def test_relogin_on_expired_session(stub_api):
+    async def run():
+        async with stub_api() as (server, api):
+            await api.async_get_overeenkomsten()
+            # the session expires on the side of Greenchoice, the client only finds out from the 403
+            api.session.cookie_jar.clear()
+            api.invalidate_cache()
+            overeenkomsten = await api.async_get_overeenkomsten()
+
+            assert [overeenkomst.overeenkomst_id for overeenkomst in overeenkomsten] == [1234567]
+            assert server.requests["/signin-oidc"] == 2
+            assert api.metrics.counters["session_expired"] == 1
+            assert api.circuit_breaker.state == GreenchoiceCircuitBreaker.CLOSED
+
+    asyncio.run(run())
+
+
+def test_rejected_credentials_keep_the_breaker_closed(stub_api):
+    async def run():
+        async with stub_api(password="wrong") as (server, api):
+            for _ in range(api.circuit_breaker.failure_threshold + 1):
+                with pytest.raises(GreenchoiceAuthError):
+                    await api.async_get_overeenkomsten()
+
+            assert api.circuit_breaker.state == GreenchoiceCircuitBreaker.CLOSED
+            assert server.requests["/Account/Login"] == 2 * (api.circuit_breaker.failure_threshold + 1)
+
+    asyncio.run(run())
+
+
+def test_unreachable_opens_the_breaker(stub_api):
+    async def run():
+        async with stub_api() as (server, api):
+            # nothing listens on the discard port
+            api.base_url = "http://localhost:9"
+            for _ in range(api.circuit_breaker.failure_threshold):
+                with pytest.raises(GreenchoiceError, match="Login request failed"):
+                    await api.async_get_overeenkomsten()
+
+            with pytest.raises(GreenchoiceError, match="requests are paused"):
+                await api.async_get_overeenkomsten()
+            assert api.circuit_breaker.state == GreenchoiceCircuitBreaker.OPEN
+
+    asyncio.run(run())
+
+
+def test_limiter_caps_concurrent_requests():
+    limiter = GreenchoiceRequestLimiter(max_concurrent=2, rate=1000, burst=100)
+    running = []
+
+    async def limited_request():
+        async with limiter:
+            running.append(limiter.as_dict()["running"])
+            await asyncio.sleep(0.01)
+
+    async def run():
+        await asyncio.gather(*(limited_request() for _ in range(6)))
+
+    asyncio.run(run())
+    assert len(running) == 6 and max(running) == 2
+    assert limiter.as_dict()["running"] == 0
+
+
+def test_limiter_waits_for_tokens():
+    limiter = GreenchoiceRequestLimiter(max_concurrent=10, rate=20, burst=2)
+
+    async def run():
+        for _ in range(4):
+            async with limiter:
+                pass
+
+    start = time.monotonic()
+    asyncio.run(run())
+
+    # the burst goes straight through, the other two wait a twentieth of a second each for a token
+    assert limiter.waits == 2
+    assert time.monotonic() - start >= 0.09
@@ -0,0 +1,72 @@
+"""Tests of the adaptive polling schedule."""
+from datetime import datetime, timedelta, timezone
+
+from custom_components.greenchoice.const import ADAPTIVE_MIN_INTERVAL_MINUTES
+from custom_components.greenchoice.greenchoice_api import GreenchoiceApiData, GreenchoiceMeterstandStroom
+from custom_components.greenchoice.scheduler import GreenchoiceAdaptiveSchedule, GreenchoicePollScheduler
+
+
+def stroom_data(measurement_date: datetime) -> GreenchoiceApiData:
+    return GreenchoiceApiData(GreenchoiceMeterstandStroom(measurement_date_electricity=measurement_date), None, None)
+
+
+def learned_schedule() -> GreenchoiceAdaptiveSchedule:
+    """A schedule that saw the reading of 2024-05-31 published at 10:00 on 2024-06-01."""
+    schedule = GreenchoiceAdaptiveSchedule()
+    schedule.next_interval(stroom_data(datetime(2024, 5, 30)), datetime(2024, 5, 31, 12, 0))
+    schedule.next_interval(stroom_data(datetime(2024, 5, 31)), datetime(2024, 6, 1, 10, 0))
+    return schedule
+
+
+def test_waits_for_the_next_window_once_published():
+    schedule = learned_schedule()
+
+    # the window of 2024-06-02 starts an hour before the usual publish time
+    assert schedule.next_interval(stroom_data(datetime(2024, 5, 31)), datetime(2024, 6, 1, 10, 15)) == timedelta(hours=22, minutes=45)
+
+
+def test_retry_at_the_start_of_the_window():
+    schedule = learned_schedule()
+
+    assert schedule.retry_interval(datetime(2024, 6, 2, 9, 0)) == timedelta(minutes=ADAPTIVE_MIN_INTERVAL_MINUTES)
+
+
+def test_retry_keeps_what_was_learned():
+    schedule = learned_schedule()
+    learned = schedule.as_dict()
+
+    schedule.retry_interval(datetime(2024, 6, 2, 9, 0))
+
+    assert schedule.as_dict() == learned
+
+
+NOW = datetime(2024, 6, 1, 12, 34, 56, tzinfo=timezone.utc)
+PERIOD = timedelta(minutes=30)
+
+
+def test_slots_deterministic():
+    scheduler = GreenchoicePollScheduler()
+    interval = scheduler.next_interval("a@example.com", NOW, PERIOD / 2, PERIOD)
+
+    assert GreenchoicePollScheduler().next_interval("a@example.com", NOW, PERIOD / 2, PERIOD) == interval
+    # accounts are keyed case insensitively, like the hubs
+    assert scheduler.next_interval("A@Example.com", NOW, PERIOD / 2, PERIOD) == interval
+    # the slot of the account, a period apart
+    slot = (NOW + interval).timestamp()
+    assert (slot - GreenchoicePollScheduler.offset("a@example.com") * PERIOD.total_seconds()) % PERIOD.total_seconds() < 1e-6
+
+
+def test_slot_at_least_earliest_ahead():
+    scheduler = GreenchoicePollScheduler()
+    for account in ("a@example.com", "b@example.com", "c@example.com"):
+        for earliest in (timedelta(0), timedelta(minutes=1), timedelta(minutes=15), timedelta(hours=2)):
+            interval = scheduler.next_interval(account, NOW, earliest, PERIOD)
+            assert earliest <= interval < earliest + PERIOD
+
+
+def test_fixed_interval_waits_half_an_interval():
+    # the coordinator polls a fixed interval in the slots of the account, at least half an interval later
+    scheduler = GreenchoicePollScheduler()
+    for minute in range(0, 60, 7):
+        interval = scheduler.next_interval("a@example.com", NOW + timedelta(minutes=minute), PERIOD / 2, PERIOD)
+        assert PERIOD / 2 <= interval < PERIOD * 3 / 2
@@ -0,0 +1,65 @@
+"""Tests of the state writes of GreenchoiceSensorEntity on coordinator updates."""
+from datetime import datetime
+from types import SimpleNamespace
+
+import pytest
+
+from custom_components.greenchoice.const import SERVICE_KOSTEN
+from custom_components.greenchoice.greenchoice_api import GreenchoiceApiData, GreenchoiceKosten
+from custom_components.greenchoice.sensor import SENSORS_COSTS_GAS, GreenchoiceSensorEntity
+from homeassistant.util import dt as dt_util
+
+DAY_1 = datetime(2024, 5, 30)
+DAY_2 = datetime(2024, 5, 31)
+
+
+def kosten_data(kosten_gas_dag: float, start_dag: datetime) -> GreenchoiceApiData:
+    return GreenchoiceApiData(None, None, None, kosten=GreenchoiceKosten(kosten_gas_dag=kosten_gas_dag, start_dag=start_dag))
+
+
+def day_sensor(data: GreenchoiceApiData) -> tuple[GreenchoiceSensorEntity, list]:
+    """The gas costs sensor of the last day and the list its state writes are recorded in."""
+    coordinator = SimpleNamespace(data=data, changed_measurements=None,
+                                  config_entry=SimpleNamespace(entry_id="test", data={"overeenkomst_id": 1}))
+    entity = GreenchoiceSensorEntity(coordinator=coordinator, description=SENSORS_COSTS_GAS[0], name="greenchoice_test",
+                                     service_key=SERVICE_KOSTEN)
+    writes = []
+    entity.async_write_ha_state = lambda: writes.append((entity.native_value, entity.last_reset))
+    return entity, writes
+
+
+def local(day: datetime) -> datetime:
+    return day.replace(tzinfo=dt_util.DEFAULT_TIME_ZONE)
+
+
+@pytest.mark.parametrize("changed_measurements", [{(SERVICE_KOSTEN, "start_dag")}, set()])
+def test_same_value_in_new_period(changed_measurements):
+    entity, writes = day_sensor(kosten_data(1.23, DAY_1))
+    assert entity.last_reset == local(DAY_1)
+
+    # a new day with the same costs, an empty set stands for an update that missed the change of the start
+    entity.coordinator.data = kosten_data(1.23, DAY_2)
+    entity.coordinator.changed_measurements = changed_measurements
+    entity._handle_coordinator_update()
+
+    assert writes == [(1.23, local(DAY_2))]
+
+
+def test_unchanged_not_written():
+    entity, writes = day_sensor(kosten_data(1.23, DAY_1))
+
+    entity.coordinator.data = kosten_data(1.23, DAY_1)
+    entity.coordinator.changed_measurements = {(SERVICE_KOSTEN, "kosten_stroom_dag")}
+    entity._handle_coordinator_update()
+
+    assert writes == []
+
+
+def test_changed_value_written():
+    entity, writes = day_sensor(kosten_data(1.23, DAY_1))
+
+    entity.coordinator.data = kosten_data(2.5, DAY_1)
+    entity.coordinator.changed_measurements = {(SERVICE_KOSTEN, "kosten_gas_dag")}
+    entity._handle_coordinator_update()
+
+    assert writes == [(2.5, local(DAY_1))]
@@ -0,0 +1,43 @@
+"""Tests of the versions kept by GreenchoiceTariffHistory."""
+import asyncio
+from datetime import datetime
+from types import SimpleNamespace
+
+import pytest
+
+from custom_components.greenchoice import tariffs
+from custom_components.greenchoice.greenchoice_api import GreenchoiceTarieven
+from custom_components.greenchoice.tariffs import GreenchoiceTariffHistory
+
+TARIEVEN = GreenchoiceTarieven(tarief_stroom_hoog_in=0.5, tarief_stroom_laag_in=0.25, tarief_gas_in=2.0, kosten_stroom_jaar=1200.0,
+                               kosten_gas_jaar=900.0, kosten_totaal_jaar=2100.0)
+
+
+@pytest.fixture
+def history(monkeypatch, memory_stores) -> tuple[GreenchoiceTariffHistory, list]:
+    """A tariff history and the list its events are recorded in."""
+    events = []
+    memory_stores(tariffs, "tariffs_store")
+    monkeypatch.setattr(tariffs.dt_util, "start_of_local_day", lambda: datetime(2024, 6, 1))
+    hass = SimpleNamespace(bus=SimpleNamespace(async_fire=lambda event, data: events.append(data)))
+    return GreenchoiceTariffHistory(hass, 1), events
+
+
+def test_price_change(history):
+    tariff_history, events = history
+    asyncio.run(tariff_history.async_record(TARIEVEN))
+
+    assert asyncio.run(tariff_history.async_record(GreenchoiceTarieven(tarief_stroom_hoog_in=0.6, tarief_stroom_laag_in=0.25, tarief_gas_in=2.0)))
+    assert events[0]["previous"] == {"tarief_stroom_laag_in": 0.25, "tarief_stroom_laag_uit": None, "tarief_stroom_hoog_in": 0.5,
+                                     "tarief_stroom_hoog_uit": None, "tarief_stroom_terugleververgoeding": None, "tarief_gas_in": 2.0}
+    assert events[0]["tarieven"]["tarief_stroom_hoog_in"] == 0.6
+
+
+def test_yearly_estimate_change(history):
+    tariff_history, events = history
+    asyncio.run(tariff_history.async_record(TARIEVEN))
+
+    assert not asyncio.run(tariff_history.async_record(GreenchoiceTarieven(tarief_stroom_hoog_in=0.5, tarief_stroom_laag_in=0.25, tarief_gas_in=2.0,
+                                                                           kosten_stroom_jaar=1300.0, kosten_totaal_jaar=2200.0)))
+    assert events == []
+    assert tariff_history.at(datetime(2024, 6, 2)).kosten_totaal_jaar is None